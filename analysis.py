@@ -0,0 +1,146 @@
+"""Technical analysis and recommendation scoring shared by the web app and the screener"""
+import numpy as np
+import pandas as pd
+
+from indicators import compute_indicators
+from indicator_state import IndicatorState
+from signals import FIB_WINDOW, fibonacci_series, recommendation_series, strength_series
+
+RECOMMENDATIONS = {1: 'קנייה', -1: 'מכירה', 0: 'החזקה'}
+# Part of the HTTP validators of analysed responses; bump it when indicators, scoring or payloads change
+INDICATOR_VERSION = 1
+
+def fibonacci_levels(high, low):
+    """Fibonacci retracement levels between a high and a low"""
+    diff = high - low
+    
+    levels = {
+        '0.0': low,
+        '0.236': low + 0.236 * diff,
+        '0.382': low + 0.382 * diff,
+        '0.5': low + 0.5 * diff,
+        '0.618': low + 0.618 * diff,
+        '0.786': low + 0.786 * diff,
+        '1.0': high
+    }
+    return levels
+
+def calculate_fibonacci_levels(data, window=FIB_WINDOW):
+    """Calculate Fibonacci retracement levels over the last ``window`` bars"""
+    recent = data.tail(window) if window else data
+    return fibonacci_levels(recent['High'].max(), recent['Low'].min())
+
+def calculate_technical_indicators(data):
+    """Calculate various technical indicators"""
+    values = compute_indicators(data['Close'].to_numpy(dtype=float))
+    return {name: pd.Series(series, index=data.index) for name, series in values.items()}
+
+def calculate_signal_history(data, indicators, fib_window=FIB_WINDOW):
+    """Strength, recommendation and Fibonacci levels at every bar of ``data``
+
+    ``changes`` lists only the bars where the recommendation switched, which
+    is what the analyze page shows as the recommendation history.
+    """
+    close = data['Close'].to_numpy(dtype=float)
+    high = data['High'].to_numpy(dtype=float)
+    low = data['Low'].to_numpy(dtype=float)
+    values = {name: series.to_numpy(dtype=float) for name, series in indicators.items()}
+    
+    levels = fibonacci_series(high, low, fib_window)
+    strength = strength_series(close, high, low, values, levels=levels)
+    recommendation = recommendation_series(strength)
+    
+    switched = np.flatnonzero(np.diff(recommendation)) + 1
+    changes = pd.DataFrame({
+        'recommendation': recommendation[switched],
+        'strength': strength[switched],
+        'price': close[switched],
+    }, index=data.index[switched])
+    
+    return {
+        'strength': pd.Series(strength, index=data.index),
+        'recommendation': pd.Series(recommendation, index=data.index),
+        'fibonacci_levels': {level: pd.Series(series, index=data.index) for level, series in levels.items()},
+        'changes': changes,
+    }
+
+def recommendation_at(data, indicators, history, position=-1):
+    """The full recommendation for one bar, read off a precomputed signal history"""
+    latest = {name: series.iloc[position] for name, series in indicators.items()}
+    fib_levels = {level: float(series.iloc[position]) for level, series in history['fibonacci_levels'].items()}
+    return score_recommendation(data['Close'].iloc[position], latest, fib_levels)
+
+def generate_trading_recommendation(data, indicators):
+    """Generate buy/sell recommendation from indicator series or a streaming IndicatorState"""
+    if isinstance(indicators, IndicatorState):
+        return score_recommendation(indicators.close, indicators.snapshot(),
+                                    fibonacci_levels(indicators.high, indicators.low))
+    
+    latest = {name: series.iloc[-1] for name, series in indicators.items()}
+    return score_recommendation(data['Close'].iloc[-1], latest, calculate_fibonacci_levels(data))
+
+def score_recommendation(current_price, latest, fib_levels):
+    """Score the latest indicator values into a buy/sell/hold recommendation"""
+    current_rsi = latest['rsi']
+    current_macd = latest['macd']
+    current_macd_signal = latest['macd_signal']
+    
+    # Analysis logic
+    signals = []
+    strength = 0
+    
+    # RSI Analysis
+    if current_rsi < 30:
+        signals.append("RSI מצביע על קנייה (oversold)")
+        strength += 2
+    elif current_rsi > 70:
+        signals.append("RSI מצביע על מכירה (overbought)")
+        strength -= 2
+    
+    # MACD Analysis
+    if current_macd > current_macd_signal:
+        signals.append("MACD מצביע על מגמה חיובית")
+        strength += 1
+    else:
+        signals.append("MACD מצביע על מגמה שלילית")
+        strength -= 1
+    
+    # Price vs Moving Averages
+    sma_20 = latest['sma_20']
+    sma_50 = latest['sma_50']
+    
+    if current_price > sma_20 > sma_50:
+        signals.append("מחיר מעל ממוצעים נעים - מגמה חיובית")
+        strength += 1
+    elif current_price < sma_20 < sma_50:
+        signals.append("מחיר מתחת לממוצעים נעים - מגמה שלילית")
+        strength -= 1
+    
+    # Fibonacci Analysis
+    for level, price in fib_levels.items():
+        if abs(current_price - price) / price < 0.02:  # Within 2% of level
+            if level in ['0.236', '0.382']:
+                signals.append(f"מחיר קרוב לרמת פיבונצי {level} - תמיכה")
+                strength += 1
+            elif level in ['0.618', '0.786']:
+                signals.append(f"מחיר קרוב לרמת פיבונצי {level} - התנגדות")
+                strength -= 1
+    
+    # Final recommendation
+    if strength >= 2:
+        recommendation = "קנייה"
+        confidence = "גבוהה" if strength >= 3 else "בינונית"
+    elif strength <= -2:
+        recommendation = "מכירה"
+        confidence = "גבוהה" if strength <= -3 else "בינונית"
+    else:
+        recommendation = "החזקה"
+        confidence = "בינונית"
+    
+    return {
+        'recommendation': recommendation,
+        'confidence': confidence,
+        'strength': strength,
+        'signals': signals,
+        'fibonacci_levels': fib_levels
+    }
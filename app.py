@@ -1,31 +1,98 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import (Blueprint, Flask, Response, abort, current_app, g, render_template, request, jsonify,
+                   redirect, send_file, url_for, flash)
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from werkzeug.local import LocalProxy
 from werkzeug.security import generate_password_hash, check_password_hash
-import yfinance as yf
-import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
-import plotly.utils
 import json
-import requests
-from datetime import datetime, timedelta
-import ta
-from bs4 import BeautifulSoup
+import sys
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import os
+import random
 from dotenv import load_dotenv
+from analysis_cache import AnalysisCache
+from singleflight import SingleFlight
+from fetch_scheduler import INTERACTIVE, PREWARM, FetchScheduler, ScheduledSource, fetch_priority
+from market import MarketOverview
+from quote_stream import QuoteHub
+from metrics import metrics, span
+from profiling import PROFILERS, ProfileStore, start_profiler
 
-load_dotenv()
+# pandas, numpy and yfinance (through analysis, chart_data, bar_store, quotes, sources,
+# screener, backtest and workers) are imported where they are first needed, so a worker
+# only pays for them once it serves a page that analyses prices.
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///stocks.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+load_dotenv()
 
-db = SQLAlchemy(app)
+db = SQLAlchemy()
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
+main = Blueprint('main', __name__)
+
+# The Services of the current app; see create_app
+services = LocalProxy(lambda: current_app.extensions['stock_tracker'])
+
+def configure(app):
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///stocks.db'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['BAR_STORE_PATH'] = os.getenv('BAR_STORE_PATH', os.path.join(app.instance_path, 'bars.db'))
+    app.config['BAR_STORE_REFRESH_SECONDS'] = int(os.getenv('BAR_STORE_REFRESH_SECONDS', 60))
+    # Memory-mapped price columns shared by every worker process; empty to read bars from SQLite
+    app.config['COLUMN_STORE_PATH'] = os.getenv('COLUMN_STORE_PATH', os.path.join(app.instance_path, 'columns'))
+    app.config['QUOTE_MAX_AGE_SECONDS'] = int(os.getenv('QUOTE_MAX_AGE_SECONDS', 15))
+    app.config['QUOTE_STREAM_INTERVAL'] = int(os.getenv('QUOTE_STREAM_INTERVAL', 10))
+    app.config['MARKET_REFRESH_SECONDS'] = int(os.getenv('MARKET_REFRESH_SECONDS', 60))
+    app.config['ANALYSIS_CACHE_SIZE'] = int(os.getenv('ANALYSIS_CACHE_SIZE', 512))
+    app.config['ANALYSIS_CACHE_TTL'] = int(os.getenv('ANALYSIS_CACHE_TTL', 3600))
+    # Per-symbol return series and aligned return matrices, shared by every user's risk report
+    app.config['RETURNS_CACHE_SIZE'] = int(os.getenv('RETURNS_CACHE_SIZE', 2048))
+    # Cache-Control max-age of data endpoints by market session; see http_cache
+    app.config['HTTP_MAX_AGE_REGULAR'] = int(os.getenv('HTTP_MAX_AGE_REGULAR', 15))
+    app.config['HTTP_MAX_AGE_EXTENDED'] = int(os.getenv('HTTP_MAX_AGE_EXTENDED', 60))
+    app.config['HTTP_MAX_AGE_CLOSED'] = int(os.getenv('HTTP_MAX_AGE_CLOSED', 3600))
+    app.config['WORKER_POOL_SIZE'] = int(os.getenv('WORKER_POOL_SIZE', os.cpu_count() or 1))
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 300))
+    app.config['SYMBOL_DIRECTORY_PATH'] = os.getenv('SYMBOL_DIRECTORY_PATH')
+    app.config['LEARNED_SYMBOLS_PATH'] = os.path.join(app.instance_path, 'symbols.csv')
+    app.config['DATA_SOURCE'] = os.getenv('DATA_SOURCE', 'yahoo')
+    app.config['FETCH_RATE'] = float(os.getenv('FETCH_RATE', 2))
+    app.config['FETCH_BURST'] = int(os.getenv('FETCH_BURST', 5))
+    app.config['FETCH_CONCURRENCY'] = int(os.getenv('FETCH_CONCURRENCY', 4))
+    app.config['FETCH_TIMEOUT'] = int(os.getenv('FETCH_TIMEOUT', 30))
+    app.config['FETCH_BREAKER_FAILURES'] = int(os.getenv('FETCH_BREAKER_FAILURES', 5))
+    app.config['FETCH_BREAKER_RESET_SECONDS'] = int(os.getenv('FETCH_BREAKER_RESET_SECONDS', 30))
+    app.config['SERVER_TIMING'] = os.getenv('SERVER_TIMING', 'false').lower() == 'true'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    app.config['PROFILE_ADMINS'] = {name.strip() for name in os.getenv('PROFILE_ADMINS', '').split(',') if name.strip()}
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config['PROFILE_KEEP'] = int(os.getenv('PROFILE_KEEP', 200))
+
+def create_app(config=None):
+    """Build the web app; ``config`` overrides the settings read from the environment"""
+    app = Flask(__name__)
+    configure(app)
+    if config:
+        app.config.update(config)
+    
+    os.makedirs(app.instance_path, exist_ok=True)
+    db.init_app(app)
+    login_manager.init_app(app)
+    app.register_blueprint(main)
+    
+    app.extensions['stock_tracker'] = stock_services = Services(app)
+    metrics.register_collector('stock_tracker_analysis_cache', stock_services.analysis_cache.stats)
+    metrics.register_collector('stock_tracker_user_cache', stock_services.user_cache.stats)
+    metrics.register_collector('stock_tracker_returns_cache', stock_services.returns_cache.stats)
+    metrics.register_collector('stock_tracker_coalescing_bars', stock_services.bar_fetches.stats)
+    metrics.register_collector('stock_tracker_coalescing_quotes', quote_fetch_stats)
+    metrics.register_collector('stock_tracker_resample', stock_services.resample_stats)
+    metrics.register_collector('stock_tracker_upstream', stock_services.fetch_scheduler.stats)
+    return app
 
 # Database Models
 class User(UserMixin, db.Model):
@@ -36,181 +103,294 @@ class User(UserMixin, db.Model):
     stocks = db.relationship('Stock', backref='user', lazy=True)
 
 class Stock(db.Model):
+    # Covers the per-user lot listing and the per-symbol aggregation without touching the table
+    __table_args__ = (db.Index('ix_stock_user_position', 'user_id', 'symbol', 'quantity', 'avg_price'),)
+    
     id = db.Column(db.Integer, primary_key=True)
-    symbol = db.Column(db.String(10), nullable=False)
+    symbol = db.Column(db.String(10), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     quantity = db.Column(db.Float, default=0)
     avg_price = db.Column(db.Float, default=0)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     added_date = db.Column(db.DateTime, default=datetime.utcnow)
 
+class SessionUser(UserMixin):
+    """Detached copy of a user's columns, so it can be cached across requests"""
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+
+def ensure_indexes():
+    """Create indexes that create_all skips on tables which already exist"""
+    for index in Stock.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Flask-Login loads the user on every request; only the first one in a while hits the DB
+    def compute():
+        user = db.session.get(User, int(user_id))
+        return SessionUser(user) if user else None
+    return services.user_cache.get_or_compute(int(user_id), compute)
 
 # Stock Analysis Functions
-def get_stock_data(symbol, period='1y'):
-    """Get stock data from Yahoo Finance"""
-    try:
-        stock = yf.Ticker(symbol)
-        data = stock.history(period=period)
-        return data
-    except Exception as e:
-        print(f"Error fetching data for {symbol}: {e}")
-        return None
+class Services:
+    """Caches, background workers and upstream access shared by one app's requests.
 
-def calculate_fibonacci_levels(data):
-    """Calculate Fibonacci retracement levels"""
-    high = data['High'].max()
-    low = data['Low'].min()
-    diff = high - low
-    
-    levels = {
-        '0.0': low,
-        '0.236': low + 0.236 * diff,
-        '0.382': low + 0.382 * diff,
-        '0.5': low + 0.5 * diff,
-        '0.618': low + 0.618 * diff,
-        '0.786': low + 0.786 * diff,
-        '1.0': high
-    }
-    return levels
-
-def calculate_technical_indicators(data):
-    """Calculate various technical indicators"""
-    indicators = {}
-    
-    # RSI
-    indicators['rsi'] = ta.momentum.RSIIndicator(data['Close']).rsi()
-    
-    # MACD
-    macd = ta.trend.MACD(data['Close'])
-    indicators['macd'] = macd.macd()
-    indicators['macd_signal'] = macd.macd_signal()
-    
-    # Bollinger Bands
-    bb = ta.volatility.BollingerBands(data['Close'])
-    indicators['bb_upper'] = bb.bollinger_hband()
-    indicators['bb_lower'] = bb.bollinger_lband()
-    indicators['bb_middle'] = bb.bollinger_mavg()
-    
-    # Moving Averages
-    indicators['sma_20'] = ta.trend.SMAIndicator(data['Close'], window=20).sma_indicator()
-    indicators['sma_50'] = ta.trend.SMAIndicator(data['Close'], window=50).sma_indicator()
-    indicators['ema_12'] = ta.trend.EMAIndicator(data['Close'], window=12).ema_indicator()
-    indicators['ema_26'] = ta.trend.EMAIndicator(data['Close'], window=26).ema_indicator()
-    
-    return indicators
-
-def generate_trading_recommendation(data, indicators):
-    """Generate buy/sell recommendation based on technical analysis"""
-    current_price = data['Close'].iloc[-1]
-    current_rsi = indicators['rsi'].iloc[-1]
-    current_macd = indicators['macd'].iloc[-1]
-    current_macd_signal = indicators['macd_signal'].iloc[-1]
-    
-    # Fibonacci levels
-    fib_levels = calculate_fibonacci_levels(data)
-    
-    # Analysis logic
-    signals = []
-    strength = 0
-    
-    # RSI Analysis
-    if current_rsi < 30:
-        signals.append("RSI מצביע על קנייה (oversold)")
-        strength += 2
-    elif current_rsi > 70:
-        signals.append("RSI מצביע על מכירה (overbought)")
-        strength -= 2
-    
-    # MACD Analysis
-    if current_macd > current_macd_signal:
-        signals.append("MACD מצביע על מגמה חיובית")
-        strength += 1
-    else:
-        signals.append("MACD מצביע על מגמה שלילית")
-        strength -= 1
-    
-    # Price vs Moving Averages
-    sma_20 = indicators['sma_20'].iloc[-1]
-    sma_50 = indicators['sma_50'].iloc[-1]
-    
-    if current_price > sma_20 > sma_50:
-        signals.append("מחיר מעל ממוצעים נעים - מגמה חיובית")
-        strength += 1
-    elif current_price < sma_20 < sma_50:
-        signals.append("מחיר מתחת לממוצעים נעים - מגמה שלילית")
-        strength -= 1
-    
-    # Fibonacci Analysis
-    for level, price in fib_levels.items():
-        if abs(current_price - price) / price < 0.02:  # Within 2% of level
-            if level in ['0.236', '0.382']:
-                signals.append(f"מחיר קרוב לרמת פיבונצי {level} - תמיכה")
-                strength += 1
-            elif level in ['0.618', '0.786']:
-                signals.append(f"מחיר קרוב לרמת פיבונצי {level} - התנגדות")
-                strength -= 1
-    
-    # Final recommendation
-    if strength >= 2:
-        recommendation = "קנייה"
-        confidence = "גבוהה" if strength >= 3 else "בינונית"
-    elif strength <= -2:
-        recommendation = "מכירה"
-        confidence = "גבוהה" if strength <= -3 else "בינונית"
-    else:
-        recommendation = "החזקה"
-        confidence = "בינונית"
-    
-    return {
-        'recommendation': recommendation,
-        'confidence': confidence,
-        'strength': strength,
-        'signals': signals,
-        'fibonacci_levels': fib_levels
-    }
-
-def get_market_overview():
-    """Get US market overview"""
-    try:
-        # Major indices
-        indices = ['^GSPC', '^DJI', '^IXIC', '^VIX']  # S&P 500, Dow Jones, NASDAQ, VIX
-        market_data = {}
+    The bar store, data source and symbol directory are built on first use,
+    which is also when the numeric stack gets imported.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self.config = config = app.config
+        # Every upstream request from this process is queued, rate limited and circuit-broken here
+        self.fetch_scheduler = FetchScheduler(rate=config['FETCH_RATE'],
+                                              burst=config['FETCH_BURST'],
+                                              workers=config['FETCH_CONCURRENCY'],
+                                              failure_threshold=config['FETCH_BREAKER_FAILURES'],
+                                              reset_timeout=config['FETCH_BREAKER_RESET_SECONDS'])
+        self.user_cache = AnalysisCache(maxsize=4096, ttl=config['USER_CACHE_TTL'])
+        self.analysis_cache = AnalysisCache(maxsize=config['ANALYSIS_CACHE_SIZE'],
+                                            ttl=config['ANALYSIS_CACHE_TTL'])
+        self.returns_cache = AnalysisCache(maxsize=config['RETURNS_CACHE_SIZE'], ttl=config['ANALYSIS_CACHE_TTL'])
+        # Concurrent requests for the same series share one store read and upstream fetch
+        self.bar_fetches = SingleFlight()
+        self.quote_hub = QuoteHub(self.get_quotes, interval=config['QUOTE_STREAM_INTERVAL'])
+        self.market_overview = MarketOverview(self.fetch_index, refresh_seconds=config['MARKET_REFRESH_SECONDS'])
+        self.name_backfill = ThreadPoolExecutor(max_workers=1, thread_name_prefix='name-backfill')
+        self.profile_store = ProfileStore(config['PROFILE_DIR'], keep=config['PROFILE_KEEP'])
+        self._built = {}
+        self._lock = threading.RLock()
+    
+    def _once(self, name, build):
+        with self._lock:
+            if name not in self._built:
+                self._built[name] = build()
+            return self._built[name]
+    
+    def install_source(self):
+        """Build the upstream data source, wrapped by the fetch scheduler, and install it process-wide.
+
+        Modules that call ``sources.get_source()`` (the bar store, quotes) go
+        through it only once this has run; later calls return the same source.
+        """
+        def build():
+            from sources import create_source, set_source
+            source = ScheduledSource(create_source(self.config['DATA_SOURCE']), self.fetch_scheduler,
+                                     timeout=self.config['FETCH_TIMEOUT'])
+            set_source(source)
+            return source
+        return self._once('source', build)
+    
+    @property
+    def source(self):
+        return self.install_source()
+    
+    @property
+    def bar_store(self):
+        def build():
+            from bar_store import BarStore
+            self.install_source()
+            return BarStore(self.config['BAR_STORE_PATH'], refresh_seconds=self.config['BAR_STORE_REFRESH_SECONDS'],
+                            columns_path=self.config['COLUMN_STORE_PATH'] or None)
+        return self._once('bar_store', build)
+    
+    @property
+    def symbol_directory(self):
+        def build():
+            from symbols import load_directory
+            return load_directory(self.config['SYMBOL_DIRECTORY_PATH'], self.config['LEARNED_SYMBOLS_PATH'])
+        return self._once('symbol_directory', build)
+    
+    @property
+    def resampler(self):
+        def build():
+            from resample import Resampler
+            return Resampler()
+        return self._once('resampler', build)
+    
+    def resample_stats(self):
+        resampler = self._built.get('resampler')
+        return resampler.stats() if resampler is not None else {'full_builds': 0, 'incremental_builds': 0, 'size': 0}
+    
+    def get_stock_data(self, symbol, period='1y', interval='1d'):
+        """Get stock data from the local bar store, topping it up from Yahoo Finance.
         
-        for index in indices:
-            ticker = yf.Ticker(index)
-            info = ticker.info
-            hist = ticker.history(period='2d')
-            
-            if not hist.empty:
-                current_price = hist['Close'].iloc[-1]
-                prev_price = hist['Close'].iloc[-2]
-                change = current_price - prev_price
-                change_percent = (change / prev_price) * 100
-                
-                market_data[index] = {
-                    'name': info.get('longName', index),
-                    'price': round(current_price, 2),
-                    'change': round(change, 2),
-                    'change_percent': round(change_percent, 2),
-                    'volume': info.get('volume', 0)
-                }
+        Only daily and 5-minute bars are stored; other intervals are resampled from them.
+        """
+        from resample import INTERVALS
+        
+        base_interval = INTERVALS[interval][0]
+        key = (symbol.upper(), period, base_interval)
+        try:
+            data = self.bar_fetches.do(key, self.bar_store.get_bars, symbol, period, base_interval)
+            return self.resampler.resample(key, data, interval)
+        except Exception as e:
+            print(f"Error fetching data for {symbol}: {e}")
+            return None
+    
+    def get_quotes(self, symbols):
+        from quotes import get_quotes
+        self.install_source()
+        return get_quotes(symbols, max_age=self.config['QUOTE_MAX_AGE_SECONDS'])
+    
+    def analyze(self, symbol, period='1y', interval='1d', data=None):
+        """Return (data, indicators, recommendation, history), reusing the last result until new bars arrive.
+        
+        ``data`` are the bars when the caller has already fetched them.
+        """
+        from analysis import calculate_signal_history, calculate_technical_indicators, recommendation_at
+        
+        if data is None:
+            data = self.get_interactive_data(symbol, period, interval)
+        if data is None or data.empty:
+            return data, None, None, None
+        
+        # The last bar's close and volume change while the bar is still open, so they are part of the key
+        last = data.iloc[-1]
+        key = (symbol.upper(), period, interval, len(data), data.index[-1].value,
+               float(last['Close']), float(last['Volume']))
         
-        return market_data
+        def compute():
+            with span('indicators'):
+                indicators = calculate_technical_indicators(data)
+            with span('scoring'):
+                history = calculate_signal_history(data, indicators)
+                recommendation = recommendation_at(data, indicators, history)
+            return indicators, recommendation, history
+        
+        indicators, recommendation, history = self.analysis_cache.get_or_compute(key, compute)
+        return data, indicators, recommendation, history
+    
+    def get_interactive_data(self, symbol, period='1y', interval='1d'):
+        # Someone is waiting on this page, so its fetches go ahead of dashboard refreshes and prewarming
+        with fetch_priority(INTERACTIVE), span('fetch'):
+            return self.get_stock_data(symbol, period, interval)
+    
+    def portfolio_risk(self, positions, period='1y', confidence=0.95, horizon=1):
+        """Risk report for per-symbol positions, built from stored daily bars"""
+        from risk import analyze_portfolio
+        
+        with fetch_priority(INTERACTIVE):
+            return analyze_portfolio(positions, period, self.get_stock_data, self.returns_cache,
+                                     confidence=confidence, horizon=horizon)
+    
+    def fetch_index(self, index):
+        with fetch_priority(PREWARM), span('market_fetch'):
+            return self.get_stock_data(index, period='5d')
+    
+    def get_market_overview(self):
+        """Get US market overview"""
+        with span('market'):
+            return self.market_overview.get()
+    
+    def backfill_stock_name(self, symbol):
+        """Look up a company name missing from the symbol directory and store it (runs in the background)"""
+        try:
+            with fetch_priority(PREWARM):
+                name = self.source.info(symbol).get('longName')
+        except Exception as e:
+            print(f"Error fetching name for {symbol}: {e}")
+            return
+        if not name:
+            return
+        
+        self.symbol_directory.remember(symbol, name, self.config['LEARNED_SYMBOLS_PATH'])
+        with self.app.app_context():
+            Stock.query.filter_by(symbol=symbol, name=symbol).update({'name': name})
+            db.session.commit()
+    
+    def worker_pool(self):
+        import workers
+        return workers.get_executor(workers=self.config['WORKER_POOL_SIZE'],
+                                    **workers.pool_settings(self.app.instance_path, self.config))
+
+def quote_fetch_stats():
+    # Nothing has fetched a quote until the quotes module is loaded
+    quotes = sys.modules.get('quotes')
+    return (quotes.quote_fetches if quotes else SingleFlight()).stats()
+
+# Request timing
+@main.before_app_request
+def start_request_timer():
+    metrics.start_request(request.endpoint)
+
+@main.after_app_request
+def finish_request_timer(response):
+    timer = metrics.finish_request(request.method, response.status_code)
+    if timer is not None and current_app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = timer.server_timing()
+    return response
+
+# Request profiling
+UNPROFILED_ENDPOINTS = {'static', 'main.prometheus_metrics', 'main.list_profiles', 'main.download_profile',
+                        'main.api_stream_portfolio'}
+
+def is_profile_admin():
+    return current_user.is_authenticated and current_user.username in current_app.config['PROFILE_ADMINS']
+
+@main.before_app_request
+def start_request_profile():
+    # ?profile=1 (sampling) or ?profile=cprofile for admins; otherwise a random share of requests
+    mode = request.args.get('profile')
+    sample_rate = current_app.config['PROFILE_SAMPLE_RATE']
+    if request.endpoint is None or request.endpoint in UNPROFILED_ENDPOINTS:
+        return
+    if mode is not None and is_profile_admin():
+        mode = mode if mode in PROFILERS else 'sample'
+    elif sample_rate and random.random() < sample_rate:
+        mode = 'sample'
+    else:
+        return
+    g.profile_mode = mode
+    g.profiler = start_profiler(mode)
+
+@main.after_app_request
+def save_request_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.stop()
+    try:
+        symbol = (request.view_args or {}).get('symbol')
+        response.headers['X-Profile'] = services.profile_store.save(profiler, g.profile_mode, request.endpoint, symbol)
     except Exception as e:
-        print(f"Error fetching market data: {e}")
-        return {}
+        print(f"Error saving profile for {request.path}: {e}")
+    return response
+
+@main.route('/admin/profiles')
+@login_required
+def list_profiles():
+    if not is_profile_admin():
+        abort(403)
+    return render_template('profiles.html', profiles=services.profile_store.list(limit=100),
+                           sample_rate=current_app.config['PROFILE_SAMPLE_RATE'])
+
+@main.route('/admin/profiles/<name>')
+@login_required
+def download_profile(name):
+    path = services.profile_store.path(name)
+    if not is_profile_admin() or path is None:
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=name)
+
+@main.route('/metrics')
+def prometheus_metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 # Routes
-@app.route('/')
+@main.route('/')
 def index():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     return render_template('index.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -219,23 +399,23 @@ def register():
         
         if User.query.filter_by(username=username).first():
             flash('שם משתמש כבר קיים')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         
         if User.query.filter_by(email=email).first():
             flash('אימייל כבר קיים')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         
-        user = User(username=username, email=email, 
+        user = User(username=username, email=email,
                    password_hash=generate_password_hash(password))
         db.session.add(user)
         db.session.commit()
         
         flash('הרשמה הושלמה בהצלחה!')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -244,49 +424,49 @@ def login():
         
         if user and check_password_hash(user.password_hash, password):
             login_user(user)
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         else:
             flash('שם משתמש או סיסמה שגויים')
     
     return render_template('login.html')
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/dashboard')
+@main.route('/dashboard')
 @login_required
 def dashboard():
-    user_stocks = Stock.query.filter_by(user_id=current_user.id).all()
-    market_overview = get_market_overview()
-    return render_template('dashboard.html', stocks=user_stocks, market=market_overview)
+    with span('db'):
+        user_stocks = Stock.query.filter_by(user_id=current_user.id).all()
+    market_overview = services.get_market_overview()
+    with span('render'):
+        return render_template('dashboard.html', stocks=user_stocks, market=market_overview)
 
-@app.route('/add_stock', methods=['POST'])
+@main.route('/add_stock', methods=['POST'])
 @login_required
 def add_stock():
     symbol = request.form['symbol'].upper()
     quantity = float(request.form['quantity'])
     avg_price = float(request.form['avg_price'])
     
-    # Get stock info from Yahoo Finance
-    try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        name = info.get('longName', symbol)
-    except:
-        name = symbol
+    # Unknown symbols are saved under their ticker and named once Yahoo Finance answers
+    name = services.symbol_directory.name(symbol)
     
-    stock = Stock(symbol=symbol, name=name, quantity=quantity, 
+    stock = Stock(symbol=symbol, name=name or symbol, quantity=quantity,
                  avg_price=avg_price, user_id=current_user.id)
     db.session.add(stock)
     db.session.commit()
     
+    if name is None:
+        services.name_backfill.submit(services.backfill_stock_name, symbol)
+    
     flash('מניה נוספה בהצלחה!')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/delete_stock/<int:stock_id>')
+@main.route('/delete_stock/<int:stock_id>')
 @login_required
 def delete_stock(stock_id):
     stock = Stock.query.get_or_404(stock_id)
@@ -294,99 +474,261 @@ def delete_stock(stock_id):
         db.session.delete(stock)
         db.session.commit()
         flash('מניה נמחקה בהצלחה!')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
+
+def requested_bars():
+    """(interval, period) asked for by the query string, or None if those bars cannot be built"""
+    from bar_store import period_start
+    from resample import DEFAULT_PERIODS, supported
+    
+    interval = request.args.get('interval', '1d')
+    period = request.args.get('period') or DEFAULT_PERIODS.get(interval)
+    if not supported(interval, period):
+        return None
+    try:
+        period_start(period, interval=interval)
+    except ValueError:
+        return None
+    return interval, period
 
-@app.route('/analyze/<symbol>')
+@main.route('/analyze/<symbol>')
 @login_required
 def analyze_stock(symbol):
-    data = get_stock_data(symbol)
+    from analysis import RECOMMENDATIONS
+    from resample import INTERVALS, is_intraday
+    
+    bars = requested_bars()
+    if bars is None:
+        flash('מרווח זמן או תקופה לא נתמכים')
+        return redirect(url_for('main.analyze_stock', symbol=symbol))
+    interval, period = bars
+    
+    data, indicators, recommendation, history = services.analyze(symbol, period, interval)
     if data is None or data.empty:
         flash('לא ניתן לקבל נתונים עבור מניה זו')
-        return redirect(url_for('dashboard'))
-    
-    indicators = calculate_technical_indicators(data)
-    recommendation = generate_trading_recommendation(data, indicators)
-    
-    # Create interactive chart
-    fig = go.Figure()
-    
-    # Candlestick chart
-    fig.add_trace(go.Candlestick(
-        x=data.index,
-        open=data['Open'],
-        high=data['High'],
-        low=data['Low'],
-        close=data['Close'],
-        name='מחיר'
-    ))
-    
-    # Moving averages
-    fig.add_trace(go.Scatter(
-        x=data.index,
-        y=indicators['sma_20'],
-        name='SMA 20',
-        line=dict(color='orange')
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=data.index,
-        y=indicators['sma_50'],
-        name='SMA 50',
-        line=dict(color='blue')
-    ))
-    
-    # Bollinger Bands
-    fig.add_trace(go.Scatter(
-        x=data.index,
-        y=indicators['bb_upper'],
-        name='Bollinger Upper',
-        line=dict(color='gray', dash='dash')
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=data.index,
-        y=indicators['bb_lower'],
-        name='Bollinger Lower',
-        line=dict(color='gray', dash='dash'),
-        fill='tonexty'
-    ))
-    
-    fig.update_layout(
-        title=f'ניתוח טכני - {symbol}',
-        xaxis_title='תאריך',
-        yaxis_title='מחיר',
-        template='plotly_white'
-    )
-    
-    chart_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    
-    return render_template('analyze.html', 
-                         symbol=symbol,
-                         data=data,
-                         indicators=indicators,
-                         recommendation=recommendation,
-                         chart_json=chart_json)
-
-@app.route('/api/stock_data/<symbol>')
-def api_stock_data(symbol):
-    data = get_stock_data(symbol)
-    if data is None:
+        return redirect(url_for('main.dashboard'))
+    
+    with span('render'):
+        return render_template('analyze.html',
+                               symbol=symbol,
+                               interval=interval,
+                               period=period,
+                               intervals=INTERVALS,
+                               date_format='%d/%m/%Y %H:%M' if is_intraday(interval) else '%d/%m/%Y',
+                               data=data,
+                               indicators=indicators,
+                               recommendation=recommendation,
+                               recommendation_changes=history['changes'].iloc[::-1].head(10),
+                               recommendations=RECOMMENDATIONS)
+
+@main.route('/api/chart/<symbol>')
+@login_required
+def api_chart(symbol):
+    from chart_data import chart_payload
+    from http_cache import cacheable, is_modified, validators
+    from responses import respond
+    
+    bars = requested_bars()
+    if bars is None:
+        return jsonify({'error': 'מרווח זמן או תקופה לא נתמכים'}), 400
+    interval, period = bars
+    
+    data = services.get_interactive_data(symbol, period, interval)
+    if data is None or data.empty:
         return jsonify({'error': 'לא ניתן לקבל נתונים'}), 400
     
-    indicators = calculate_technical_indicators(data)
-    recommendation = generate_trading_recommendation(data, indicators)
+    # The chart only changes with the bars, so a client holding the current one gets nothing to recompute
+    cache = validators(data, symbol, interval, period)
+    if not is_modified(cache):
+        return cacheable(Response(status=304), cache)
+    
+    data, indicators, _, history = services.analyze(symbol, period, interval, data)
+    with span('chart'):
+        payload = chart_payload(data, indicators,
+                                width=request.args.get('width', 1000, type=int),
+                                start=request.args.get('start'),
+                                end=request.args.get('end'),
+                                history=history)
+    payload['symbol'] = symbol
+    payload['bar_interval'] = interval
+    with span('json'):
+        return cacheable(respond(payload), cache)
+
+@main.route('/api/stock_data/<symbol>')
+def api_stock_data(symbol):
+    from http_cache import cacheable, is_modified, validators
+    from responses import respond
+    
+    bars = requested_bars()
+    if bars is None:
+        return jsonify({'error': 'מרווח זמן או תקופה לא נתמכים'}), 400
+    interval, period = bars
     
+    data = services.get_interactive_data(symbol, period, interval)
+    if data is None or data.empty:
+        return jsonify({'error': 'לא ניתן לקבל נתונים'}), 400
+    
+    # Polled every 30 seconds but only changes with a new bar or tick; public, so proxies can answer too
+    cache = validators(data, symbol, interval, period)
+    if not is_modified(cache):
+        return cacheable(Response(status=304), cache, public=True)
+    
+    data, indicators, recommendation, _ = services.analyze(symbol, period, interval, data)
+    with span('json'):
+        return cacheable(respond({
+            'symbol': symbol,
+            'interval': interval,
+            'current_price': float(data['Close'].iloc[-1]),
+            'change': float(data['Close'].iloc[-1] - data['Close'].iloc[-2]),
+            'change_percent': float(((data['Close'].iloc[-1] - data['Close'].iloc[-2]) / data['Close'].iloc[-2]) * 100),
+            'volume': int(data['Volume'].iloc[-1]),
+            'rsi': float(indicators['rsi'].iloc[-1]),
+            'recommendation': recommendation
+        }), cache, public=True)
+
+@main.route('/api/search_stocks')
+def api_search_stocks():
+    query = request.args.get('q', '').strip()
+    directory = services.symbol_directory
+    limit = min(max(request.args.get('limit', 10, type=int), 1), directory.limit)
+    return jsonify(directory.search(query, limit=limit))
+
+@main.route('/api/stream/portfolio')
+@login_required
+def api_stream_portfolio():
+    from portfolio import load_lots
+    from quotes import value_holdings
+    
+    lots = [SimpleNamespace(id=lot.id, symbol=lot.symbol.upper(),
+                            quantity=lot.quantity, avg_price=lot.avg_price)
+            for lot in load_lots(db.session, Stock, current_user.id)]
+    quote_hub = services.quote_hub
+    subscription = quote_hub.subscribe({lot.symbol for lot in lots})
+    
+    def stream():
+        quotes = {}
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                changes = subscription.get(timeout=15)
+                if not changes:
+                    yield ': keepalive\n\n'
+                    continue
+                
+                # Totals need every quote; per-lot rows only go out for symbols that moved.
+                # A symbol without a quote (None) goes out once as an error row
+                quotes.update(changes)
+                portfolio = value_holdings(lots, quotes)
+                portfolio['holdings'] = [h for h in portfolio['holdings'] if h['symbol'] in changes]
+                portfolio['quotes'] = {s: q for s, q in changes.items() if q is not None}
+                yield f'event: quotes\ndata: {json.dumps(portfolio)}\n\n'
+        finally:
+            quote_hub.unsubscribe(subscription)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@main.route('/api/cache_stats')
+@login_required
+def api_cache_stats():
     return jsonify({
-        'symbol': symbol,
-        'current_price': float(data['Close'].iloc[-1]),
-        'change': float(data['Close'].iloc[-1] - data['Close'].iloc[-2]),
-        'change_percent': float(((data['Close'].iloc[-1] - data['Close'].iloc[-2]) / data['Close'].iloc[-2]) * 100),
-        'volume': int(data['Volume'].iloc[-1]),
-        'rsi': float(indicators['rsi'].iloc[-1]),
-        'recommendation': recommendation
+        'analysis': services.analysis_cache.stats(),
+        'returns': services.returns_cache.stats(),
+        'coalescing': {
+            'bars': services.bar_fetches.stats(),
+            'quotes': quote_fetch_stats(),
+        },
+        'upstream': services.fetch_scheduler.stats(),
+        'resample': services.resample_stats(),
     })
 
+@main.route('/api/portfolio_quotes')
+@login_required
+def api_portfolio_quotes():
+    from portfolio import value_portfolio
+    
+    portfolio = value_portfolio(db.session, Stock, current_user.id, services.get_quotes)
+    return jsonify(portfolio)
+
+@main.route('/api/portfolio_risk')
+@login_required
+def api_portfolio_risk():
+    from portfolio import load_positions
+    from responses import respond
+    
+    confidence = request.args.get('confidence', 0.95, type=float)
+    horizon = request.args.get('horizon', 1, type=int)
+    if not 0.5 <= confidence < 1 or not 1 <= horizon <= 250:
+        return jsonify({'error': 'פרמטרים לא חוקיים'}), 400
+    
+    positions = load_positions(db.session, Stock, current_user.id)
+    with span('risk'):
+        report = services.portfolio_risk(positions, period=request.args.get('period', '1y'),
+                                         confidence=confidence, horizon=horizon)
+    if report is None:
+        return jsonify({'error': 'לא ניתן לקבל נתונים'}), 400
+    with span('json'):
+        return respond(report)
+
+def resolve_universe():
+    """Symbols selected by the universe/symbols query arguments, or None if unknown"""
+    import screener
+    
+    def held(universe):
+        if universe == 'stocks':
+            return [row.symbol for row in db.session.query(Stock.symbol).distinct()]
+        if universe == 'portfolio':
+            return [row.symbol for row in
+                    db.session.query(Stock.symbol).filter_by(user_id=current_user.id).distinct()]
+        return None
+    
+    return screener.resolve_symbols(current_app.instance_path, request.args.get('universe', 'sp500'),
+                                    symbols=request.args.get('symbols'), held=held)
+
+@main.route('/api/screener')
+@login_required
+def api_screener():
+    import screener
+    from responses import respond
+    
+    signal = request.args.get('signal')
+    if signal and signal not in screener.SIGNALS:
+        return jsonify({'error': 'סוג אות לא חוקי'}), 400
+    
+    symbols = resolve_universe()
+    if symbols is None:
+        return jsonify({'error': 'יקום מניות לא מוכר'}), 400
+    
+    results = screener.screen(symbols, services.worker_pool(),
+                              period=request.args.get('period', '1y'),
+                              signal=signal,
+                              limit=request.args.get('limit', type=int))
+    return respond({'universe': request.args.get('universe', 'sp500'),
+                    'count': len(symbols),
+                    'results': results})
+
+@main.route('/api/backtest')
+@login_required
+def api_backtest():
+    import backtest
+    from responses import respond
+    
+    symbols = resolve_universe()
+    if symbols is None:
+        return jsonify({'error': 'יקום מניות לא מוכר'}), 400
+    
+    fee = request.args.get('fee', backtest.DEFAULT_FEE, type=float)
+    results = backtest.backtest_symbols(symbols, services.worker_pool(),
+                                        period=request.args.get('period', '10y'),
+                                        fee=fee,
+                                        allow_short=request.args.get('short') == '1')
+    return respond({'count': len(symbols), 'fee': fee, 'results': results})
+
+# `gunicorn app:app` and `flask --app app run` serve this instance
+app = create_app()
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
-    app.run(debug=True)
\ No newline at end of file
+        ensure_indexes()
+    app.run(debug=True)
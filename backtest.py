@@ -0,0 +1,183 @@
+"""Vectorized backtest of the recommendation rules.
+
+The strength score from ``signals`` is computed for every bar. A buy
+opens a long position at that bar's close, a sell closes it (or flips to
+short with ``allow_short``) and a hold keeps whatever is open. Fees are a
+fraction of traded notional, charged on every change of position. All of
+it runs on whole arrays, one row per symbol, without per-bar Python loops.
+
+    python backtest.py --symbols AAPL,MSFT --period 10y --fee 0.001
+    python backtest.py --universe sp500 --period 10y
+"""
+import argparse
+import time
+
+import numpy as np
+
+import workers
+from indicators import compute_indicators
+from screener import add_universe_arguments, resolve_symbols
+from signals import FIB_WINDOW, recommendation_series, strength_series
+
+TRADING_DAYS = 252
+DEFAULT_FEE = 0.001
+
+
+def _forward_fill_signals(recommendation, allow_short):
+    """Target position after each bar: the last buy/sell seen, 0 before the first"""
+    columns = np.arange(recommendation.shape[-1])
+    last_signal = np.where(recommendation != 0, columns, 0)
+    last_signal = np.maximum.accumulate(last_signal, axis=-1)
+    target = np.take_along_axis(recommendation, last_signal, axis=-1)
+    if not allow_short:
+        target = np.maximum(target, 0)
+    return target
+
+
+def simulate(close, recommendation, fee=DEFAULT_FEE, allow_short=False):
+    """Positions, per-bar strategy returns and equity curves for 1-D or 2-D arrays"""
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    recommendation = np.atleast_2d(recommendation)
+
+    target = _forward_fill_signals(recommendation, allow_short)
+    # Trades fill at the close of the signal bar, so the position earns from the next bar on
+    position = np.zeros_like(target, dtype=np.float64)
+    position[:, 1:] = target[:, :-1]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.nan_to_num(close[:, 1:] / close[:, :-1] - 1.0)
+    returns = np.concatenate([np.zeros((close.shape[0], 1)), returns], axis=1)
+
+    turnover = np.abs(np.diff(position, axis=1, prepend=0.0))
+    strategy = position * returns - fee * turnover
+    equity = np.cumprod(1.0 + strategy, axis=1)
+    return position, strategy, equity
+
+
+def _trade_returns(position, strategy):
+    """Compounded return of every round trip, plus the row each trade belongs to"""
+    previous = np.concatenate([np.zeros((position.shape[0], 1)), position[:, :-1]], axis=1)
+    entries = (position != 0) & (position != previous)
+    trade_ids = np.cumsum(entries.ravel()).reshape(position.shape)
+    # The exit bar belongs to the trade too: that is where the closing fee is booked
+    exit_bar = (position == 0) & (previous != 0)
+    ids = np.where((position != 0) | exit_bar, trade_ids, 0).ravel()
+
+    log_growth = np.log1p(np.maximum(strategy.ravel(), -0.999999))
+    totals = np.bincount(ids, weights=log_growth)[1:]
+    rows = np.repeat(np.arange(position.shape[0]), entries.sum(axis=1))
+    return np.expm1(totals), rows
+
+
+def summarize(close, position, strategy, equity):
+    """Per-row return, drawdown, trade and hit-rate statistics"""
+    close = np.atleast_2d(close)
+    valid = ~np.isnan(close)
+    bars = valid.sum(axis=1)
+    first = np.where(valid.any(axis=1), valid.argmax(axis=1), 0)
+    first_close = close[np.arange(close.shape[0]), first]
+    last_close = close[:, -1]
+
+    peaks = np.maximum.accumulate(equity, axis=1)
+    drawdown = (equity / peaks - 1.0).min(axis=1)
+
+    trade_returns, trade_rows = _trade_returns(position, strategy)
+    trades = np.bincount(trade_rows, minlength=close.shape[0])
+    wins = np.bincount(trade_rows, weights=(trade_returns > 0).astype(float), minlength=close.shape[0])
+
+    stats = []
+    for row in range(close.shape[0]):
+        total = equity[row, -1] - 1.0
+        years = bars[row] / TRADING_DAYS
+        stats.append({
+            'total_return': float(total),
+            'annual_return': float((1.0 + total) ** (1.0 / years) - 1.0) if years > 0 and total > -1 else -1.0,
+            'buy_hold_return': float(last_close[row] / first_close[row] - 1.0) if bars[row] else 0.0,
+            'max_drawdown': float(drawdown[row]),
+            'trades': int(trades[row]),
+            'hit_rate': float(wins[row] / trades[row]) if trades[row] else None,
+            'exposure': float((position[row] != 0).sum() / bars[row]) if bars[row] else 0.0,
+            'bars': int(bars[row]),
+        })
+    return stats
+
+
+def backtest_arrays(close, high, low, fee=DEFAULT_FEE, allow_short=False, fib_window=FIB_WINDOW):
+    """Backtest one or many symbols given aligned close/high/low arrays"""
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    high = np.atleast_2d(np.asarray(high, dtype=np.float64))
+    low = np.atleast_2d(np.asarray(low, dtype=np.float64))
+    indicators = compute_indicators(close)
+    strength = strength_series(close, high, low, indicators, fib_window)
+    position, strategy, equity = simulate(close, recommendation_series(strength), fee, allow_short)
+    return summarize(close, position, strategy, equity)
+
+
+def backtest_frame(data, fee=DEFAULT_FEE, allow_short=False, fib_window=FIB_WINDOW):
+    """Backtest an OHLC DataFrame such as ``get_stock_data`` returns"""
+    return backtest_arrays(data['Close'].to_numpy(dtype=float),
+                           data['High'].to_numpy(dtype=float),
+                           data['Low'].to_numpy(dtype=float),
+                           fee=fee, allow_short=allow_short, fib_window=fib_window)[0]
+
+
+def _backtest_symbol(symbol, period, fee, allow_short):
+    """Load one symbol and backtest it (runs inside a pool worker)"""
+    try:
+        store = workers.get_store()
+        if store.columns is not None:
+            # Straight from the shared memory map, no DataFrame in between
+            bars = store.get_columns(symbol, period)
+            if len(bars) < 2:
+                return None
+            result = backtest_arrays(bars.close, bars.high, bars.low, fee=fee, allow_short=allow_short)[0]
+        else:
+            data = store.get_bars(symbol, period)
+            if data is None or len(data) < 2:
+                return None
+            result = backtest_frame(data, fee=fee, allow_short=allow_short)
+    except Exception as e:
+        print(f"Error backtesting {symbol}: {e}")
+        return None
+    result['symbol'] = symbol
+    return result
+
+
+def backtest_symbols(symbols, executor, period='10y', fee=DEFAULT_FEE, allow_short=False):
+    """Backtest ``symbols`` on ``executor``, best total return first"""
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    count = len(symbols)
+    results = executor.map(_backtest_symbol, symbols, [period] * count, [fee] * count,
+                           [allow_short] * count, chunksize=workers.chunksize(count))
+    results = [r for r in results if r is not None]
+    results.sort(key=lambda r: r['total_return'], reverse=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest the recommendation rules')
+    add_universe_arguments(parser)
+    parser.add_argument('--period', default='10y')
+    parser.add_argument('--fee', type=float, default=DEFAULT_FEE)
+    parser.add_argument('--short', action='store_true', help='go short on sell signals')
+    args = parser.parse_args()
+
+    symbols = resolve_symbols(args.instance, args.universe, args.symbols, args.file)
+    started = time.perf_counter()
+    with workers.open_pool(args.instance, args.workers) as executor:
+        results = backtest_symbols(symbols, executor, period=args.period, fee=args.fee,
+                                   allow_short=args.short)
+
+    for r in results:
+        hit_rate = f"{r['hit_rate'] * 100:5.1f}%" if r['hit_rate'] is not None else '    -'
+        print(f"{r['symbol']:<8} return {r['total_return'] * 100:>+8.1f}% "
+              f"(buy&hold {r['buy_hold_return'] * 100:>+8.1f}%) "
+              f"drawdown {r['max_drawdown'] * 100:>6.1f}% trades {r['trades']:>4} hit {hit_rate}")
+    if results:
+        mean_return = sum(r['total_return'] for r in results) / len(results)
+        print(f"mean return {mean_return * 100:+.1f}%", end=' | ')
+    print(f"{len(results)} of {len(symbols)} symbols in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from column_store import DTYPES, Columns, ColumnStore
+from sources import get_source
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+PERIOD_UNITS = {'d': 1, 'wk': 7, 'mo': 31, 'y': 366}
+# Yahoo Finance serves intraday bars for the last 60 days only and rejects earlier starts
+INTRADAY_DAYS = 59
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    PRIMARY KEY (symbol, interval, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS series (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    covered_from INTEGER NOT NULL,
+    last_fetch REAL NOT NULL,
+    tz TEXT,
+    PRIMARY KEY (symbol, interval)
+);
+'''
+
+
+def period_start(period, now=None, interval='1d'):
+    """Return the earliest UTC epoch second a yfinance period string asks for"""
+    now = now or datetime.now(timezone.utc)
+    if interval.endswith(('m', 'h')):
+        return max(_period_start(period, now), int((now - timedelta(days=INTRADAY_DAYS)).timestamp()))
+    return _period_start(period, now)
+
+
+def _period_start(period, now):
+    if period == 'max':
+        return 0
+    if period == 'ytd':
+        return int(datetime(now.year, 1, 1, tzinfo=timezone.utc).timestamp())
+
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    days = count * PERIOD_UNITS[unit]
+    if unit == 'd':
+        # Day periods count trading sessions, so leave room for weekends and holidays
+        days = days * 7 // 5 + 5
+    return int((now - timedelta(days=days)).timestamp())
+
+
+class BarStore:
+    """SQLite-backed OHLCV store keyed by (symbol, interval).
+
+    Bars are downloaded once and then topped up incrementally: only bars from
+    the last stored session onwards are requested again, and not more often
+    than every ``refresh_seconds``. Everything else is served from disk.
+    When upstream fails, whatever is already stored is served as it is.
+
+    With ``columns_path`` every series is also mirrored into a memory-mapped
+    ``ColumnStore``, rewritten on the first read after each change, and
+    reads are served from it instead of SQLite; ``get_columns`` then hands
+    out zero-copy NumPy views.
+    """
+
+    def __init__(self, path, refresh_seconds=60, source=None, columns_path=None):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.source = source
+        self.columns = ColumnStore(columns_path) if columns_path else None
+        self._lock = threading.Lock()
+        self._series_locks = {}
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_bars(self, symbol, period='1y', interval='1d'):
+        """Return OHLCV bars for ``period``, fetching from Yahoo only what is missing"""
+        symbol = symbol.upper()
+        start = period_start(period, interval=interval)
+        self._refresh(symbol, interval, start)
+
+        if self.columns is not None:
+            data = self._read_columns(symbol, interval, start).to_frame()
+        else:
+            data = self._load(symbol, interval, start)
+        sessions = re.fullmatch(r'(\d+)d', period)
+        if sessions:
+            dates = data.index.normalize().unique()[-int(sessions.group(1)):]
+            data = data[data.index.normalize().isin(dates)]
+        return data
+
+    def get_columns(self, symbol, period='1y', interval='1d'):
+        """Like ``get_bars`` but as read-only NumPy views of the column store (requires ``columns_path``)"""
+        if self.columns is None:
+            raise RuntimeError('The bar store was opened without a column store')
+        symbol = symbol.upper()
+        start = period_start(period, interval=interval)
+        self._refresh(symbol, interval, start)
+        columns = self._read_columns(symbol, interval, start)
+        sessions = re.fullmatch(r'(\d+)d', period)
+        if sessions and len(columns):
+            days = pd.to_datetime(columns.ts, unit='s', utc=True)
+            if columns.tz:
+                days = days.tz_convert(columns.tz)
+            days = days.normalize()
+            first_day = days.unique()[-int(sessions.group(1)):][0]
+            columns = columns.slice(int(days.searchsorted(first_day, side='left')))
+        return columns
+
+    def _refresh(self, symbol, interval, start):
+        with self._series_lock(symbol, interval):
+            series = self._series(symbol, interval)
+            try:
+                if series is None or series['covered_from'] > start:
+                    self._download(symbol, interval, start)
+                elif time.time() - series['last_fetch'] >= self.refresh_seconds:
+                    self._top_up(symbol, interval, series)
+            except Exception as e:
+                if series is None:
+                    raise
+                print(f"Error refreshing {symbol}, serving stored bars: {e}")
+
+    def _history(self, symbol, **kwargs):
+        return (self.source or get_source()).history(symbol, **kwargs)
+
+    def _series_lock(self, symbol, interval):
+        with self._lock:
+            return self._series_locks.setdefault((symbol, interval), threading.Lock())
+
+    def _series(self, symbol, interval):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT covered_from, last_fetch, tz FROM series WHERE symbol = ? AND interval = ?',
+                (symbol, interval)).fetchone()
+        if row is None:
+            return None
+        return {'covered_from': row[0], 'last_fetch': row[1], 'tz': row[2]}
+
+    def _download(self, symbol, interval, start):
+        """Fetch the whole requested window and record how far back it reaches"""
+        if start == 0:
+            history = self._history(symbol, period='max', interval=interval)
+        else:
+            since = datetime.fromtimestamp(start, timezone.utc).strftime('%Y-%m-%d')
+            history = self._history(symbol, start=since, interval=interval)
+        # Nothing came back, so nothing is covered; the next read asks again
+        if history is None or history.empty:
+            return
+        self._save(symbol, interval, history, covered_from=start)
+
+    def _top_up(self, symbol, interval, series):
+        """Re-fetch from the last stored session so the open bar gets refreshed too"""
+        with self._connect() as conn:
+            last_ts = conn.execute(
+                'SELECT MAX(ts) FROM bars WHERE symbol = ? AND interval = ?',
+                (symbol, interval)).fetchone()[0]
+        if last_ts is None:
+            self._download(symbol, interval, series['covered_from'])
+            return
+
+        last_bar = pd.Timestamp(last_ts, unit='s', tz='UTC')
+        if series['tz']:
+            last_bar = last_bar.tz_convert(series['tz'])
+        history = self._history(symbol, start=last_bar.strftime('%Y-%m-%d'), interval=interval)
+
+        # Prices are split/dividend adjusted, so a new corporate action invalidates every stored bar
+        actions = [col for col in ('Dividends', 'Stock Splits') if col in history.columns]
+        new_bars = history[history.index > last_bar]
+        if actions and (new_bars[actions].fillna(0) != 0).any().any():
+            self.clear(symbol, interval)
+            self._download(symbol, interval, series['covered_from'])
+            return
+
+        self._save(symbol, interval, history, covered_from=series['covered_from'])
+
+    def _save(self, symbol, interval, history, covered_from):
+        rows = []
+        tz = None
+        if history is not None and not history.empty:
+            tz = str(history.index.tz) if history.index.tz is not None else None
+            index = history.index if history.index.tz is not None else history.index.tz_localize('UTC')
+            stamps = index.as_unit('s').asi8
+            values = history[COLUMNS].to_numpy(dtype=float)
+            rows = [(symbol, interval, int(ts), *map(float, bar)) for ts, bar in zip(stamps, values)]
+
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.execute(
+                'INSERT INTO series (symbol, interval, covered_from, last_fetch, tz) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (symbol, interval) DO UPDATE SET '
+                'covered_from = MIN(covered_from, excluded.covered_from), '
+                'last_fetch = excluded.last_fetch, tz = COALESCE(excluded.tz, tz)',
+                (symbol, interval, covered_from, time.time(), tz))
+
+    def _read_columns(self, symbol, interval, start):
+        """Column views from ``start``, re-exported from SQLite when the file lags behind the series"""
+        series = self._series(symbol, interval)
+        columns = self.columns.read(symbol, interval)
+        if series is not None and (columns is None or columns.generation != series['last_fetch']):
+            with self._series_lock(symbol, interval):
+                self._export(symbol, interval)
+            columns = self.columns.read(symbol, interval)
+        if columns is None:
+            return self._empty_columns()
+        return columns.since(start)
+
+    def _export(self, symbol, interval):
+        """Write the whole stored series to the column store"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT ts, open, high, low, close, volume FROM bars '
+                'WHERE symbol = ? AND interval = ? ORDER BY ts',
+                (symbol, interval)).fetchall()
+            series = conn.execute(
+                'SELECT last_fetch, tz FROM series WHERE symbol = ? AND interval = ?',
+                (symbol, interval)).fetchone()
+        if series is None:
+            self.columns.remove(symbol, interval)
+            return
+        values = np.array(rows, dtype=np.float64).reshape(-1, 6)
+        self.columns.write(symbol, interval, values[:, 0].astype(np.int64), *values[:, 1:].T,
+                           tz=series[1], generation=series[0])
+
+    @staticmethod
+    def _empty_columns():
+        return Columns({name: np.empty(0, dtype=dtype) for name, dtype in DTYPES.items()})
+
+    def _load(self, symbol, interval, start):
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT ts, open, high, low, close, volume FROM bars '
+                'WHERE symbol = ? AND interval = ? AND ts >= ? ORDER BY ts',
+                (symbol, interval, start)).fetchall()
+            tz = conn.execute(
+                'SELECT tz FROM series WHERE symbol = ? AND interval = ?',
+                (symbol, interval)).fetchone()
+
+        frame = pd.DataFrame(rows, columns=['ts'] + COLUMNS)
+        index = pd.to_datetime(frame.pop('ts'), unit='s', utc=True)
+        if tz and tz[0]:
+            index = index.dt.tz_convert(tz[0])
+        frame.index = pd.DatetimeIndex(index, name='Date')
+        return frame
+
+    def clear(self, symbol, interval='1d'):
+        """Forget everything stored for one series"""
+        symbol = symbol.upper()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM bars WHERE symbol = ? AND interval = ?', (symbol, interval))
+            conn.execute('DELETE FROM series WHERE symbol = ? AND interval = ?', (symbol, interval))
+        if self.columns is not None:
+            self.columns.remove(symbol, interval)
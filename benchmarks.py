@@ -0,0 +1,355 @@
+"""Offline benchmarks for the analysis pipeline.
+
+Runs the indicator, recommendation, Fibonacci and chart-payload code on
+synthetic or recorded bars of several lengths, reads them back from the
+bar store, and the /api/stock_data route through the Flask test client
+for several symbol counts. Nothing touches the network. Results are
+written as JSON so two commits can be compared.
+
+    python benchmarks.py run --output before.json
+    python benchmarks.py run --output after.json --compare before.json
+    python benchmarks.py record --symbols AAPL,MSFT --period 10y --out recordings
+    python benchmarks.py run --provider recorded --recordings recordings
+    python benchmarks.py startup --budget 1.0
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import sources
+
+BAR_COUNTS = [250, 1000, 5000]
+SYMBOL_COUNTS = [1, 10, 50]
+QUICK_BAR_COUNTS = [250, 1000]
+QUICK_SYMBOL_COUNTS = [1, 10]
+REGRESSION_THRESHOLD = 1.2
+# Sub-millisecond timings jitter by more than 20% between runs; ignore differences below this
+MIN_REGRESSION_MS = 0.5
+# Seconds from launching Python to having served the login and register pages
+STARTUP_BUDGET_SECONDS = 1.0
+# None of these may be loaded just to serve the login and register pages
+HEAVY_MODULES = ('pandas', 'numpy', 'yfinance')
+
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+for path in ('/login', '/register'):
+    assert client.get(path).status_code == 200, path
+print(json.dumps({'import': imported - started, 'requests': time.perf_counter() - imported,
+                  'heavy': [name for name in %r if name in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(fn, repeat, warmup=1):
+    """Wall-clock statistics in milliseconds over ``repeat`` calls of ``fn``"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'repeat': repeat,
+        'min_ms': round(samples[0], 4),
+        'median_ms': round(statistics.median(samples), 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+    }
+
+
+def benchmark_symbols(source, count):
+    """``count`` symbols the provider can serve"""
+    if isinstance(source, sources.RecordedSource):
+        recorded = sorted(name.rsplit('_', 1)[0] for name in os.listdir(source.directory)
+                          if name.endswith('_1d.csv'))
+        if not recorded:
+            raise SystemExit(f"No recordings in {source.directory}")
+        return [recorded[i % len(recorded)] for i in range(count)]
+    return [f'SYN{i:03d}' for i in range(count)]
+
+
+def bench_analysis(source, bar_counts, repeat):
+    """The per-symbol analysis functions on histories of increasing length"""
+    from analysis import (calculate_fibonacci_levels, calculate_signal_history,
+                          calculate_technical_indicators, generate_trading_recommendation)
+    from chart_data import chart_payload
+    from responses import encode_columns, encode_json
+
+    full = source.history(benchmark_symbols(source, 1)[0], period='max')
+    results = []
+    for bars in bar_counts:
+        if bars > len(full):
+            print(f"Skipping {bars} bars: the provider only has {len(full)}")
+            continue
+        data = full.tail(bars)
+        indicators = calculate_technical_indicators(data)
+        history = calculate_signal_history(data, indicators)
+        cases = {
+            'calculate_technical_indicators': lambda: calculate_technical_indicators(data),
+            'generate_trading_recommendation': lambda: generate_trading_recommendation(data, indicators),
+            'calculate_fibonacci_levels': lambda: calculate_fibonacci_levels(data),
+            'calculate_signal_history': lambda: calculate_signal_history(data, indicators),
+            'chart_payload': lambda: encode_json(chart_payload(data, indicators, width=1000, history=history)),
+            'chart_payload_columns': lambda: encode_columns(chart_payload(data, indicators, width=1000,
+                                                                          history=history)),
+        }
+        for name, fn in cases.items():
+            results.append({'name': name, 'params': {'bars': bars}, **measure(fn, repeat)})
+    return results
+
+
+def bench_store(source, bar_counts, repeat, workdir):
+    """Reading stored bars back: SQLite rows vs the memory-mapped column store"""
+    from bar_store import BarStore
+
+    symbol = benchmark_symbols(source, 1)[0]
+    sqlite = BarStore(os.path.join(workdir, 'store-sqlite.db'), refresh_seconds=10 ** 9, source=source)
+    mapped = BarStore(os.path.join(workdir, 'store-columns.db'), refresh_seconds=10 ** 9, source=source,
+                      columns_path=os.path.join(workdir, 'columns'))
+    sqlite.get_bars(symbol, 'max')
+    mapped.get_bars(symbol, 'max')
+    available = len(mapped.get_columns(symbol, 'max'))
+
+    results = []
+    for bars in bar_counts:
+        if bars > available:
+            continue
+        # Whole years, so the period covers at least ``bars`` sessions
+        period = f'{-(-bars // 250)}y'
+        params = {'bars': bars}
+        results.append({'name': 'store_get_bars_sqlite', 'params': params,
+                        **measure(lambda: sqlite.get_bars(symbol, period), repeat)})
+        results.append({'name': 'store_get_bars_columns', 'params': params,
+                        **measure(lambda: mapped.get_bars(symbol, period), repeat)})
+        results.append({'name': 'store_get_columns', 'params': params,
+                        **measure(lambda: mapped.get_columns(symbol, period), repeat)})
+    return results
+
+
+def bench_routes(symbol_counts, repeat, symbols_for):
+    """/api/stock_data through the test client: cold store, stored bars, and cached analysis"""
+    import app as webapp
+
+    client = webapp.app.test_client()
+    services = webapp.app.extensions['stock_tracker']
+    results = []
+    for count in symbol_counts:
+        symbols = symbols_for(count)
+
+        def request_all():
+            for symbol in symbols:
+                response = client.get(f'/api/stock_data/{symbol}')
+                if response.status_code != 200:
+                    raise RuntimeError(f"/api/stock_data/{symbol} returned {response.status_code}")
+
+        def cold():
+            for symbol in set(symbols):
+                services.bar_store.clear(symbol)
+            services.analysis_cache.clear()
+            request_all()
+
+        def stored():
+            services.analysis_cache.clear()
+            request_all()
+
+        params = {'symbols': count}
+        results.append({'name': 'api_stock_data_cold', 'params': params, **measure(cold, max(1, repeat // 4))})
+        results.append({'name': 'api_stock_data_stored', 'params': params, **measure(stored, repeat)})
+        results.append({'name': 'api_stock_data_cached', 'params': params, **measure(request_all, repeat)})
+    return results
+
+
+def bench_startup(repeat):
+    """A fresh interpreter importing the app and serving /login and /register, ``repeat`` times"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    walls, imports, heavy = [], [], set()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        probe = subprocess.run([sys.executable, '-c', STARTUP_PROBE], capture_output=True, text=True,
+                               cwd=here, env=os.environ.copy(), timeout=120)
+        walls.append((time.perf_counter() - started) * 1000)
+        if probe.returncode != 0:
+            raise RuntimeError(f"Startup probe failed:\n{probe.stderr}")
+        timings = json.loads(probe.stdout.strip().splitlines()[-1])
+        imports.append(timings['import'] * 1000)
+        heavy.update(timings['heavy'])
+
+    def summary(samples):
+        samples = sorted(samples)
+        return {'repeat': repeat, 'min_ms': round(samples[0], 4),
+                'median_ms': round(statistics.median(samples), 4),
+                'mean_ms': round(statistics.fmean(samples), 4), 'p95_ms': round(samples[-1], 4)}
+
+    return [
+        {'name': 'startup_to_login', 'params': {}, 'heavy_modules': sorted(heavy), **summary(walls)},
+        {'name': 'startup_import_app', 'params': {}, **summary(imports)},
+    ]
+
+
+def check_startup(results, budget):
+    """Print the startup timings; returns False if they break the budget or import the numeric stack"""
+    wall = next(result for result in results if result['name'] == 'startup_to_login')
+    imported = next(result for result in results if result['name'] == 'startup_import_app')
+    print(f"import app: median {imported['median_ms']:.0f}ms; launch to /login and /register: "
+          f"median {wall['median_ms']:.0f}ms, budget {budget * 1000:.0f}ms")
+    ok = True
+    if wall['median_ms'] > budget * 1000:
+        print(f"Startup is over budget by {wall['median_ms'] - budget * 1000:.0f}ms")
+        ok = False
+    if wall['heavy_modules']:
+        print(f"Serving the login page imported {', '.join(wall['heavy_modules'])}")
+        ok = False
+    return ok
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD, min_delta_ms=MIN_REGRESSION_MS):
+    """Print current/baseline median ratios; returns the benchmarks slower than ``threshold``"""
+    def key(result):
+        return result['name'], json.dumps(result['params'], sort_keys=True)
+
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    print(f"\n{'benchmark':<40} {'params':<16} {'before':>10} {'after':>10} {'ratio':>7}")
+    for result in current['results']:
+        before = previous.get(key(result))
+        if before is None or not before['median_ms']:
+            continue
+        ratio = result['median_ms'] / before['median_ms']
+        slower = ratio > threshold and result['median_ms'] - before['median_ms'] >= min_delta_ms
+        flag = ' <-- slower' if slower else ''
+        params = ','.join(f'{k}={v}' for k, v in result['params'].items())
+        print(f"{result['name']:<40} {params:<16} {before['median_ms']:>9.2f}ms "
+              f"{result['median_ms']:>9.2f}ms {ratio:>6.2f}x{flag}")
+        if slower:
+            regressions.append(result)
+    return regressions
+
+
+def run(args):
+    # The web app picks its provider and bar store up from the environment at import
+    workdir = tempfile.mkdtemp(prefix='stock-bench-')
+    os.environ['DATA_SOURCE'] = args.provider
+    os.environ['BAR_STORE_PATH'] = os.path.join(workdir, 'bars.db')
+    os.environ['COLUMN_STORE_PATH'] = os.path.join(workdir, 'columns')
+    os.environ['FETCH_RATE'] = '1000000'
+    os.environ['FETCH_BURST'] = '1000000'
+    if args.recordings:
+        os.environ['RECORDED_SOURCE_PATH'] = args.recordings
+    source = sources.create_source(args.provider)
+
+    bar_counts = QUICK_BAR_COUNTS if args.quick else BAR_COUNTS
+    symbol_counts = QUICK_SYMBOL_COUNTS if args.quick else SYMBOL_COUNTS
+    repeat = max(1, args.repeat // 4) if args.quick else args.repeat
+
+    started = time.perf_counter()
+    results = bench_startup(max(3, repeat // 4))
+    results += bench_analysis(source, bar_counts, repeat)
+    results += bench_store(source, bar_counts, repeat, workdir)
+    if not args.skip_routes:
+        results += bench_routes(symbol_counts, repeat, lambda count: benchmark_symbols(source, count))
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'provider': args.provider,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'seconds': round(time.perf_counter() - started, 2),
+        },
+        'results': results,
+    }
+
+    for result in results:
+        params = ','.join(f'{k}={v}' for k, v in result['params'].items())
+        print(f"{result['name']:<40} {params:<16} median {result['median_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms")
+
+    output = args.output or os.path.join('instance', 'benchmarks', f"{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {output} in {report['meta']['seconds']}s")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than {args.threshold}x the baseline")
+            return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the analysis pipeline')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks and write JSON results')
+    run_parser.add_argument('--provider', choices=['fake', 'recorded'], default='fake')
+    run_parser.add_argument('--recordings', help='directory written by the record command')
+    run_parser.add_argument('--repeat', type=int, default=20)
+    run_parser.add_argument('--quick', action='store_true', help='fewer sizes and repeats')
+    run_parser.add_argument('--skip-routes', action='store_true')
+    run_parser.add_argument('--output', help='JSON path (default instance/benchmarks/<commit>.json)')
+    run_parser.add_argument('--compare', help='baseline JSON to compare against')
+    run_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+
+    record_parser = commands.add_parser('record', help='save bars from a live provider for offline runs')
+    record_parser.add_argument('--symbols', required=True, help='comma separated symbols')
+    record_parser.add_argument('--period', default='10y')
+    record_parser.add_argument('--provider', choices=['yahoo', 'fake'], default='yahoo')
+    record_parser.add_argument('--out', default='recordings')
+
+    startup_parser = commands.add_parser('startup', help='check cold start time against a budget')
+    startup_parser.add_argument('--repeat', type=int, default=5)
+    startup_parser.add_argument('--budget', type=float, default=STARTUP_BUDGET_SECONDS, help='seconds')
+
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        return run(args)
+    if args.command == 'record':
+        symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+        saved = sources.record_history(sources.create_source(args.provider), symbols, args.out, args.period)
+        print(f"Recorded {len(saved)} of {len(symbols)} symbols to {args.out}")
+        return 0
+    if args.command == 'startup':
+        return 0 if check_startup(bench_startup(args.repeat), args.budget) else 1
+
+    with open(args.current) as f:
+        current = json.load(f)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    return 1 if compare(current, baseline, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""Chart payloads sized to the viewport.
+
+Candles are aggregated to coarser calendar intervals until they fit the
+available width, and indicator lines are reduced with Largest-Triangle-
+Three-Buckets, which keeps peaks and troughs that plain striding drops.
+Zoomed ranges are served from full-resolution bars whenever they fit.
+"""
+import numpy as np
+import pandas as pd
+
+# Coarser intervals tried in order, with the pandas resample rule for each
+CANDLE_INTERVALS = [('1W', 'W-FRI'), ('1M', 'ME'), ('3M', 'QE'), ('1Y', 'YE')]
+# Intraday bars go through shorter buckets first; hours start on the half hour the session opens on
+INTRADAY_CANDLE_INTERVALS = [('15m', '15min'), ('1h', '60min'), ('1D', '1D')]
+CHART_LINES = ['sma_20', 'sma_50', 'bb_upper', 'bb_lower', 'rsi', 'macd', 'macd_signal']
+
+PIXELS_PER_CANDLE = 4
+MIN_WIDTH = 100
+MAX_WIDTH = 4000
+
+
+def lttb(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of ``(x, y)``"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket is the third corner of the triangle
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(area.argmax())
+        keep[bucket + 1] = previous
+    return keep
+
+
+def aggregate_candles(data, rule):
+    """Resample OHLCV bars to a coarser calendar interval"""
+    offset = '30min' if rule == '60min' else None
+    bars = data.resample(rule, offset=offset).agg({
+        'Open': 'first',
+        'High': 'max',
+        'Low': 'min',
+        'Close': 'last',
+        'Volume': 'sum',
+    })
+    return bars.dropna(subset=['Close'])
+
+
+def _dates(index, intraday):
+    """Exchange-local dates (minutes for intraday bars), left as datetime64 for the response encoder"""
+    local = index.tz_localize(None) if index.tz is not None else index
+    return local.to_numpy().astype('datetime64[m]' if intraday else 'datetime64[D]')
+
+
+def _is_intraday(index):
+    if len(index) < 2:
+        return False
+    # Median rather than min so a DST switch between daily bars does not count
+    return bool(np.median(np.diff(index.as_unit('s').asi8)) < 20 * 3600)
+
+
+def chart_payload(data, indicators, width=1000, start=None, end=None, history=None):
+    """Columnar chart data for ``data`` between ``start`` and ``end``, fitted to ``width`` pixels.
+
+    Indicators are passed in already computed over the full history, so
+    the values at the start of a zoomed range are not affected by warm-up.
+    With a signal ``history`` from ``analysis.calculate_signal_history`` the
+    payload also carries the strength line and the recommendation switches.
+    Series are NumPy arrays; ``responses`` encodes them as JSON or packed columns.
+    """
+    width = min(max(int(width), MIN_WIDTH), MAX_WIDTH)
+    mask = np.ones(len(data), dtype=bool)
+    if start is not None:
+        mask &= data.index >= _as_timestamp(start, data.index.tz)
+    if end is not None:
+        mask &= data.index <= _as_timestamp(end, data.index.tz)
+    bars = data[mask]
+    intraday = _is_intraday(data.index)
+
+    max_candles = max(width // PIXELS_PER_CANDLE, 1)
+    interval = 'bar'
+    candles = bars
+    for name, rule in (INTRADAY_CANDLE_INTERVALS if intraday else []) + CANDLE_INTERVALS:
+        if len(candles) <= max_candles:
+            break
+        interval = name
+        candles = aggregate_candles(bars, rule)
+
+    series = {name: indicators[name] for name in CHART_LINES}
+    if history is not None:
+        series['strength'] = history['strength']
+
+    lines = {}
+    seconds = bars.index.as_unit('s').asi8.astype(np.float64)
+    for name, full in series.items():
+        values = np.asarray(full, dtype=np.float64)[mask]
+        valid = ~np.isnan(values)
+        keep = lttb(seconds[valid], values[valid], width)
+        kept_index = bars.index[valid][keep]
+        lines[name] = {
+            'x': _dates(kept_index, intraday),
+            'y': np.round(values[valid][keep], 4),
+        }
+
+    payload = {
+        'interval': interval,
+        'points': len(bars),
+        'range': _dates(data.index[[0, -1]], intraday) if len(data) else [],
+        'candles': {
+            'x': _dates(candles.index, intraday and interval in ('bar', '15m', '1h')),
+            'open': np.round(candles['Open'].to_numpy(dtype=float), 4),
+            'high': np.round(candles['High'].to_numpy(dtype=float), 4),
+            'low': np.round(candles['Low'].to_numpy(dtype=float), 4),
+            'close': np.round(candles['Close'].to_numpy(dtype=float), 4),
+        },
+        'lines': lines,
+    }
+    if history is not None:
+        changes = history['changes']
+        if len(bars):
+            changes = changes[(changes.index >= bars.index[0]) & (changes.index <= bars.index[-1])]
+        else:
+            changes = changes.iloc[:0]
+        payload['signals'] = {
+            'x': _dates(changes.index, intraday),
+            'recommendation': changes['recommendation'].to_numpy(dtype=np.int32),
+            'strength': changes['strength'].to_numpy(dtype=np.int32),
+            'price': np.round(changes['price'].to_numpy(dtype=float), 4),
+        }
+    return payload
+
+
+def _as_timestamp(value, tz):
+    stamp = pd.Timestamp(value)
+    if tz is not None:
+        stamp = stamp.tz_localize(tz) if stamp.tzinfo is None else stamp.tz_convert(tz)
+    return stamp
@@ -0,0 +1,164 @@
+"""Memory-mapped columnar copies of the bar store's price history.
+
+Each (symbol, interval) series is one file of fixed-width little-endian
+columns: int64 epoch-second timestamps, float64 open/high/low/close and
+int64 volume, each 64-byte aligned behind a 1 KiB JSON header holding
+the row count, time zone, column offsets and the bar store fetch the
+file was written from. Files are replaced atomically, so readers never
+see a partial write, and opened with mmap, so every worker process
+reading the same series shares one copy in the page cache and gets
+read-only NumPy views of it without copying.
+
+    <directory>/1d/AAPL.cols
+"""
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'STKCOLS1'
+HEADER_SIZE = 1024
+ALIGNMENT = 64
+# Prices keep the float64 values SQLite holds, so both read paths return identical bars
+DTYPES = {'ts': '<i8', 'open': '<f8', 'high': '<f8', 'low': '<f8', 'close': '<f8', 'volume': '<i8'}
+FRAME_COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+
+class Columns:
+    """Read-only column views of one series (or a slice of it)"""
+    __slots__ = ('ts', 'open', 'high', 'low', 'close', 'volume', 'tz', 'generation')
+
+    def __init__(self, arrays, tz=None, generation=0.0):
+        for name in DTYPES:
+            setattr(self, name, arrays[name])
+        self.tz = tz
+        self.generation = generation
+
+    def __len__(self):
+        return len(self.ts)
+
+    def since(self, start):
+        """Bars at or after epoch second ``start``; views, not copies"""
+        first = int(np.searchsorted(self.ts, start, side='left'))
+        return self.slice(first)
+
+    def slice(self, first, last=None):
+        return Columns({name: getattr(self, name)[first:last] for name in DTYPES}, self.tz, self.generation)
+
+    def to_frame(self):
+        """OHLCV DataFrame in the bar store's shape (float64 columns, tz-aware index named Date)"""
+        index = pd.to_datetime(self.ts, unit='s', utc=True)
+        if self.tz:
+            index = index.tz_convert(self.tz)
+        return pd.DataFrame({label: getattr(self, name).astype(np.float64)
+                             for name, label in FRAME_COLUMNS.items()},
+                            index=pd.DatetimeIndex(index, name='Date'))
+
+
+class ColumnStore:
+    """Directory of column files with a bounded cache of open memory maps"""
+
+    def __init__(self, directory, max_open=256):
+        self.directory = directory
+        self.max_open = max_open
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, symbol, interval):
+        return os.path.join(self.directory, interval, f'{symbol.upper()}.cols')
+
+    def write(self, symbol, interval, ts, open, high, low, close, volume, tz=None, generation=0.0):
+        """Replace the stored series with these arrays"""
+        arrays = {
+            'ts': np.asarray(ts, dtype=DTYPES['ts']),
+            'open': np.asarray(open, dtype=DTYPES['open']),
+            'high': np.asarray(high, dtype=DTYPES['high']),
+            'low': np.asarray(low, dtype=DTYPES['low']),
+            'close': np.asarray(close, dtype=DTYPES['close']),
+            'volume': np.rint(np.nan_to_num(np.asarray(volume, dtype=np.float64))).astype(DTYPES['volume']),
+        }
+        rows = len(arrays['ts'])
+        offsets, offset = {}, HEADER_SIZE
+        for name, array in arrays.items():
+            if len(array) != rows:
+                raise ValueError(f"Column {name} has {len(array)} rows, expected {rows}")
+            offsets[name] = offset
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        header = json.dumps({'rows': rows, 'tz': tz, 'generation': generation,
+                             'columns': {name: [DTYPES[name], offsets[name]] for name in arrays}}).encode()
+        if len(MAGIC) + 4 + len(header) > HEADER_SIZE:
+            raise ValueError(f"Header for {symbol} does not fit in {HEADER_SIZE} bytes")
+
+        path = self.path(symbol, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(MAGIC + len(header).to_bytes(4, 'little') + header)
+                for name, array in arrays.items():
+                    f.seek(offsets[name])
+                    f.write(array.tobytes())
+                f.truncate(offset)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def read(self, symbol, interval, start=None):
+        """Column views of a series, from epoch second ``start`` on, or None if it is not stored"""
+        columns = self._open(symbol.upper(), interval)
+        if columns is None or start is None:
+            return columns
+        return columns.since(start)
+
+    def remove(self, symbol, interval):
+        try:
+            os.unlink(self.path(symbol, interval))
+        except FileNotFoundError:
+            pass
+
+    def _open(self, symbol, interval):
+        path = self.path(symbol, interval)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        # A replaced file has a new inode; views handed out earlier keep the old mapping alive
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        key = (symbol, interval)
+        with self._lock:
+            cached = self._maps.get(key)
+            if cached is not None and cached[0] == signature:
+                self._maps.move_to_end(key)
+                return cached[1]
+
+        columns = self._map(path)
+        with self._lock:
+            self._maps[key] = (signature, columns)
+            self._maps.move_to_end(key)
+            # Each open map holds a file descriptor
+            while len(self._maps) > self.max_open:
+                self._maps.popitem(last=False)
+        return columns
+
+    def _map(self, path):
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a column file")
+        length = int.from_bytes(bytes(buffer[len(MAGIC):len(MAGIC) + 4]), 'little')
+        header = json.loads(bytes(buffer[len(MAGIC) + 4:len(MAGIC) + 4 + length]))
+        if {name: dtype for name, (dtype, _) in header['columns'].items()} != DTYPES:
+            # Written with other column types (float32 prices before); the bar store exports it again
+            return None
+        rows = header['rows']
+        arrays = {}
+        for name, (dtype, offset) in header['columns'].items():
+            dtype = np.dtype(dtype)
+            arrays[name] = buffer[offset:offset + rows * dtype.itemsize].view(dtype)
+        return Columns(arrays, header['tz'], header['generation'])
@@ -0,0 +1,241 @@
+"""Central scheduler for upstream data requests.
+
+Every call to the data source is queued by priority, released at a
+token-bucket rate and run on a bounded set of worker threads. A circuit
+breaker stops calling upstream after repeated failures; while it is open
+calls fail immediately with ``CircuitOpenError`` so callers can fall back
+to the data they already have instead of waiting on a throttled provider.
+
+Priorities are taken from the calling context, set per request with
+``fetch_priority``:
+
+    with fetch_priority(INTERACTIVE):
+        data = get_stock_data(symbol)
+"""
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+INTERACTIVE = 0
+DASHBOARD = 1
+PREWARM = 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', DASHBOARD: 'dashboard', PREWARM: 'prewarm'}
+
+_priority = contextvars.ContextVar('fetch_priority', default=DASHBOARD)
+
+
+@contextmanager
+def fetch_priority(priority):
+    """Run the enclosed upstream fetches at ``priority``"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class CircuitOpenError(Exception):
+    """Upstream is considered down; the call was not attempted"""
+
+
+class TokenBucket:
+    """Allows ``rate`` calls per second on average with bursts of up to ``burst``"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    After ``reset_timeout`` seconds one trial call is let through
+    (half-open); success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self.opened_at is None:
+            return 'closed'
+        if now - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == 'closed':
+                return True
+            # A trial that never reported back (e.g. cancelled in the queue) does not block the next one
+            if state == 'half_open' and (self._trial_at is None or now - self._trial_at >= self.reset_timeout):
+                self._trial_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_at = None
+
+
+class FetchScheduler:
+    """Priority queue of upstream calls drained by ``workers`` threads at a limited rate"""
+
+    def __init__(self, rate=2.0, burst=5, workers=4, failure_threshold=5, reset_timeout=30):
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.workers = workers
+        self.executed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.throttled_seconds = 0.0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def submit(self, fn, *args, priority=None, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` and return a Future for its result"""
+        if priority is None:
+            priority = current_priority()
+        future = Future()
+        if not self.breaker.allow():
+            with self._condition:
+                self.rejected += 1
+            future.set_exception(CircuitOpenError('upstream circuit is open'))
+            return future
+
+        with self._condition:
+            if not self._threads:
+                self._start()
+            heapq.heappush(self._queue, (priority, next(self._sequence), future, fn, args, kwargs))
+            self._condition.notify()
+        return future
+
+    def call(self, fn, *args, priority=None, timeout=None, **kwargs):
+        """Run ``fn`` through the scheduler and wait for its result"""
+        future = self.submit(fn, *args, priority=priority, **kwargs)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def _start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'fetch-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                _, _, future, fn, args, kwargs = heapq.heappop(self._queue)
+            if not future.set_running_or_notify_cancel():
+                continue
+            # The circuit may have opened while this call sat in the queue
+            if self.breaker.state == 'open':
+                with self._condition:
+                    self.rejected += 1
+                future.set_exception(CircuitOpenError('upstream circuit is open'))
+                continue
+
+            waited = self.bucket.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self.breaker.record_failure()
+                with self._condition:
+                    self.executed += 1
+                    self.failed += 1
+                    self.throttled_seconds += waited
+                future.set_exception(e)
+            else:
+                self.breaker.record_success()
+                with self._condition:
+                    self.executed += 1
+                    self.throttled_seconds += waited
+                future.set_result(result)
+
+    def stats(self):
+        with self._condition:
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for item in self._queue:
+                queued[PRIORITY_NAMES.get(item[0], str(item[0]))] += 1
+            return {
+                'queued': queued,
+                'executed': self.executed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'throttled_seconds': round(self.throttled_seconds, 3),
+                'circuit': self.breaker.state,
+                'consecutive_failures': self.breaker.failures,
+            }
+
+
+class ScheduledSource:
+    """Wraps a data source from ``sources`` so every call goes through a ``FetchScheduler``"""
+
+    def __init__(self, source, scheduler, timeout=30):
+        self.source = source
+        self.scheduler = scheduler
+        self.timeout = timeout
+        self.name = source.name
+
+    def history(self, symbol, **kwargs):
+        return self.scheduler.call(self.source.history, symbol, timeout=self.timeout, **kwargs)
+
+    def download(self, symbols, **kwargs):
+        return self.scheduler.call(self.source.download, symbols, timeout=self.timeout, **kwargs)
+
+    def info(self, symbol):
+        return self.scheduler.call(self.source.info, symbol, timeout=self.timeout)
@@ -0,0 +1,105 @@
+"""HTTP validators and cache lifetimes for responses built from analysed bars.
+
+A response of a data endpoint is fully determined by the bars it was
+computed from, the request and the indicator code, so its ``ETag`` is a
+digest of exactly those: symbol, interval, period, query string,
+negotiated format, the last bar (timestamp, close and volume, which move
+while the bar is open) and ``analysis.INDICATOR_VERSION``. Routes fetch
+the bars, which the bar store usually has locally, check the request's
+``If-None-Match``/``If-Modified-Since`` against them and answer
+``304 Not Modified`` before any indicator is computed or encoded.
+
+``Cache-Control`` follows the exchange's session: a few seconds while it
+trades, longer in pre- and after-hours and up to the next opening (at
+most ``HTTP_MAX_AGE_CLOSED``) when it is closed, so browsers and reverse
+proxies skip most polls after hours and on weekends.
+"""
+import hashlib
+from collections import namedtuple
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+from flask import current_app, request
+from werkzeug.http import is_resource_modified
+
+from analysis import INDICATOR_VERSION
+from responses import wants_columns
+
+DEFAULT_TIMEZONE = 'America/New_York'
+# Exchange timezone -> (first minute, last minute, session) of a trading day, Monday to Friday
+SESSIONS = {
+    'America/New_York': ((240, 570, 'extended'), (570, 960, 'regular'), (960, 1200, 'extended')),
+    'America/Chicago': ((180, 510, 'extended'), (510, 900, 'regular'), (900, 1140, 'extended')),
+    'Europe/London': ((480, 990, 'regular'),),
+}
+# Exchanges without known hours count as trading all weekday
+ALL_DAY = ((0, 1440, 'regular'),)
+# How long a bar at each interval stays open
+BAR_LENGTHS = {'5m': '5min', '15m': '15min', '30m': '30min', '1h': '60min',
+               '1d': '1D', '1wk': '7D', '1mo': 'MS', '3mo': 'QS'}
+# Yahoo Finance keeps revising a bar for a while after it closes
+SETTLE = timedelta(minutes=15)
+
+Validators = namedtuple('Validators', 'etag last_modified max_age')
+
+
+def market_session(tz, now=None):
+    """(session, seconds until it ends) on the exchange in timezone ``tz`` at ``now``"""
+    zone = ZoneInfo(tz)
+    local = (now or datetime.now(timezone.utc)).astimezone(zone)
+    hours = SESSIONS.get(tz, ALL_DAY)
+    for days in range(8):
+        day = local.date() + timedelta(days=days)
+        if day.weekday() >= 5:
+            continue
+        midnight = datetime.combine(day, time(), tzinfo=zone)
+        for first, last, session in hours:
+            opens, closes = midnight + timedelta(minutes=first), midnight + timedelta(minutes=last)
+            if local < opens:
+                return 'closed', (opens - local).total_seconds()
+            if local < closes:
+                return session, (closes - local).total_seconds()
+    return 'closed', None
+
+
+def bars_timezone(data):
+    tz = data.index.tz
+    return getattr(tz, 'key', None) or getattr(tz, 'zone', None) or DEFAULT_TIMEZONE
+
+
+def validators(data, symbol, interval, period):
+    """``Validators`` of the response built from ``data``, bars at ``interval``"""
+    last = data.iloc[-1]
+    parts = (INDICATOR_VERSION, symbol, interval, period, wants_columns(),
+             sorted(request.args.items(multi=True)),
+             len(data), data.index[-1].value, float(last['Close']), float(last['Volume']))
+    etag = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+    now = datetime.now(timezone.utc)
+    # The last bar may change until it has closed and settled
+    bar_end = data.index[-1] + pd.tseries.frequencies.to_offset(BAR_LENGTHS[interval])
+    if bar_end.tzinfo is None:
+        bar_end = bar_end.tz_localize(DEFAULT_TIMEZONE)
+    last_modified = min(now, (bar_end + SETTLE).to_pydatetime())
+
+    session, remaining = market_session(bars_timezone(data), now)
+    max_age = current_app.config[f'HTTP_MAX_AGE_{session.upper()}']
+    if remaining is not None:
+        max_age = min(max_age, int(remaining))
+    return Validators(etag, last_modified, max_age)
+
+
+def is_modified(validators):
+    return is_resource_modified(request.environ, etag=validators.etag, last_modified=validators.last_modified)
+
+
+def cacheable(response, validators, public=False):
+    """``response`` with the validators and a ``Cache-Control`` for the market session"""
+    response.set_etag(validators.etag)
+    response.last_modified = validators.last_modified
+    response.cache_control.public = public
+    response.cache_control.private = not public
+    response.cache_control.max_age = validators.max_age
+    response.vary.add('Accept')
+    return response
@@ -0,0 +1,303 @@
+"""Incremental indicator state for streaming bar updates.
+
+Each indicator is seeded once from history and then advanced in constant
+time. ``update`` appends a new bar; ``revise`` replaces the close of the
+last bar, which is what a tick inside a still-open bar does. Values follow
+the same conventions as ``indicators.compute_indicators``: NaN until the
+warm-up period is complete.
+"""
+import math
+from collections import deque
+
+import indicators
+from signals import FIB_WINDOW
+
+
+class EMA:
+    """Exponential moving average with ``span=window`` and ``adjust=False``"""
+
+    def __init__(self, window, alpha=None):
+        self.window = window
+        self.alpha = alpha if alpha is not None else 2.0 / (window + 1)
+        self.count = 0
+        self._previous = None
+        self._current = None
+
+    def update(self, x):
+        self._previous = self._current
+        self.count += 1
+        return self._apply(x)
+
+    def revise(self, x):
+        if self.count == 0:
+            return self.update(x)
+        return self._apply(x)
+
+    def _apply(self, x):
+        if self._previous is None:
+            self._current = x
+        else:
+            self._current = self._previous + self.alpha * (x - self._previous)
+        return self.value
+
+    @property
+    def value(self):
+        return self._current if self.count >= self.window else math.nan
+
+
+class SMA:
+    """Simple moving average over a fixed window, with optional population std"""
+
+    def __init__(self, window):
+        self.window = window
+        self._values = deque(maxlen=window)
+        self._base = None
+        self._sum = 0.0
+        self._squares = 0.0
+
+    def update(self, x):
+        if self._base is None:
+            self._base = x
+        if len(self._values) == self.window:
+            self._remove(self._values[0])
+        self._values.append(x)
+        self._add(x)
+        return self.value
+
+    def revise(self, x):
+        if not self._values:
+            return self.update(x)
+        self._remove(self._values[-1])
+        self._values[-1] = x
+        self._add(x)
+        return self.value
+
+    def _add(self, x):
+        # Sums are kept relative to the first value seen to limit cancellation in std
+        centered = x - self._base
+        self._sum += centered
+        self._squares += centered * centered
+
+    def _remove(self, x):
+        centered = x - self._base
+        self._sum -= centered
+        self._squares -= centered * centered
+
+    @property
+    def value(self):
+        if len(self._values) < self.window:
+            return math.nan
+        return self._base + self._sum / self.window
+
+    @property
+    def std(self):
+        if len(self._values) < self.window:
+            return math.nan
+        mean = self._sum / self.window
+        return math.sqrt(max(self._squares / self.window - mean * mean, 0.0))
+
+
+class RSI:
+    """Relative Strength Index with Wilder smoothing"""
+
+    def __init__(self, window=indicators.RSI_WINDOW):
+        self.window = window
+        self._up = EMA(window, alpha=1.0 / window)
+        self._down = EMA(window, alpha=1.0 / window)
+        self._closes = deque(maxlen=2)
+
+    def update(self, close):
+        self._closes.append(close)
+        up, down = self._moves()
+        self._up.update(up)
+        self._down.update(down)
+        return self.value
+
+    def revise(self, close):
+        if not self._closes:
+            return self.update(close)
+        self._closes[-1] = close
+        up, down = self._moves()
+        self._up.revise(up)
+        self._down.revise(down)
+        return self.value
+
+    def _moves(self):
+        if len(self._closes) < 2:
+            return 0.0, 0.0
+        diff = self._closes[-1] - self._closes[-2]
+        return max(diff, 0.0), max(-diff, 0.0)
+
+    @property
+    def value(self):
+        avg_up, avg_down = self._up.value, self._down.value
+        if math.isnan(avg_down):
+            return math.nan
+        if avg_down == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + avg_up / avg_down)
+
+
+class MACD:
+    """MACD line and signal line built from two EMAs of the close"""
+
+    def __init__(self, fast=indicators.MACD_FAST, slow=indicators.MACD_SLOW,
+                 signal=indicators.MACD_SIGNAL):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close):
+        self.fast.update(close)
+        self.slow.update(close)
+        if not math.isnan(self.value):
+            self.signal.update(self.value)
+        return self.value
+
+    def revise(self, close):
+        self.fast.revise(close)
+        self.slow.revise(close)
+        if not math.isnan(self.value):
+            self.signal.revise(self.value)
+        return self.value
+
+    @property
+    def value(self):
+        return self.fast.value - self.slow.value
+
+    @property
+    def signal_value(self):
+        return self.signal.value
+
+
+class RollingRange:
+    """Highest high and lowest low of the last ``window`` bars, like ``signals.running_range``.
+
+    Candidates are kept in monotonic deques of (bar, value), so each bar is
+    added and dropped once. ``revise`` may only widen the last bar's range.
+    """
+
+    def __init__(self, window=FIB_WINDOW):
+        self.window = window
+        self.bars = 0
+        self._highs = deque()
+        self._lows = deque()
+
+    def update(self, high, low):
+        self.bars += 1
+        self._push(high, low)
+
+    def revise(self, high, low):
+        if self.bars == 0:
+            return self.update(high, low)
+        self._push(high, low)
+
+    def _push(self, high, low):
+        bar = self.bars
+        # NaN prices are skipped, as np.fmax/np.nanmax do
+        if not math.isnan(high):
+            while self._highs and self._highs[-1][1] <= high:
+                self._highs.pop()
+            self._highs.append((bar, high))
+        if not math.isnan(low):
+            while self._lows and self._lows[-1][1] >= low:
+                self._lows.pop()
+            self._lows.append((bar, low))
+        for extremes in (self._highs, self._lows):
+            while extremes and extremes[0][0] <= bar - self.window:
+                extremes.popleft()
+
+    @property
+    def high(self):
+        return self._highs[0][1] if self._highs else -math.inf
+
+    @property
+    def low(self):
+        return self._lows[0][1] if self._lows else math.inf
+
+
+class IndicatorState:
+    """All indicators used by the recommendation for one symbol.
+
+    Also tracks the high/low range of the last ``fib_window`` bars, which is
+    what the Fibonacci levels are drawn from.
+    """
+
+    def __init__(self, fib_window=FIB_WINDOW):
+        self.rsi = RSI()
+        self.macd = MACD()
+        self.bollinger = SMA(indicators.BB_WINDOW)
+        self.smas = {window: SMA(window) for window in indicators.SMA_WINDOWS}
+        self.range = RollingRange(fib_window)
+        self.close = math.nan
+        self.bars = 0
+        self._last_bar_range = (-math.inf, math.inf)
+
+    @property
+    def high(self):
+        return self.range.high
+
+    @property
+    def low(self):
+        return self.range.low
+
+    @classmethod
+    def from_history(cls, data):
+        """Seed the state from an OHLC DataFrame such as ``get_stock_data`` returns"""
+        state = cls()
+        for close, high, low in zip(data['Close'].to_numpy(dtype=float),
+                                    data['High'].to_numpy(dtype=float),
+                                    data['Low'].to_numpy(dtype=float)):
+            state.update(close, high, low)
+        return state
+
+    def update(self, close, high=None, low=None):
+        """Append a new bar"""
+        self.bars += 1
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.bollinger.update(close)
+        for sma in self.smas.values():
+            sma.update(close)
+        self._last_bar_range = (-math.inf, math.inf)
+        self.range.update(*self._set_last(close, high, low))
+        return self.snapshot()
+
+    def revise(self, close, high=None, low=None):
+        """Replace the last bar's close (and optionally its range) with a new tick"""
+        if self.bars == 0:
+            return self.update(close, high, low)
+        self.rsi.revise(close)
+        self.macd.revise(close)
+        self.bollinger.revise(close)
+        for sma in self.smas.values():
+            sma.revise(close)
+        self.range.revise(*self._set_last(close, high, low))
+        return self.snapshot()
+
+    def _set_last(self, close, high, low):
+        # A tick can only widen the range of the bar it belongs to
+        bar_high, bar_low = self._last_bar_range
+        bar_high = max(bar_high, close if high is None else high)
+        bar_low = min(bar_low, close if low is None else low)
+        self._last_bar_range = (bar_high, bar_low)
+        self.close = close
+        return bar_high, bar_low
+
+    def snapshot(self):
+        """Latest indicator values keyed like ``compute_indicators``"""
+        middle = self.bollinger.value
+        width = indicators.BB_DEV * self.bollinger.std
+        values = {
+            'rsi': self.rsi.value,
+            'macd': self.macd.value,
+            'macd_signal': self.macd.signal_value,
+            'bb_upper': middle + width,
+            'bb_lower': middle - width,
+            'bb_middle': middle,
+            'ema_12': self.macd.fast.value,
+            'ema_26': self.macd.slow.value,
+        }
+        for window, sma in self.smas.items():
+            values[f'sma_{window}'] = sma.value
+        return values
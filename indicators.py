@@ -0,0 +1,177 @@
+"""Vectorized technical indicators on NumPy arrays.
+
+Every function accepts a 1-D array of closes or a 2-D array with one row
+per symbol. Rows are aligned on their last bar; symbols with a shorter
+history are padded with NaN at the start. The numbers match the ``ta``
+library (RSI with Wilder smoothing, ``adjust=False`` EMAs, population
+standard deviation for the Bollinger bands).
+"""
+import numpy as np
+
+RSI_WINDOW = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+BB_WINDOW = 20
+BB_DEV = 2
+SMA_WINDOWS = (20, 50)
+
+# Keeps decay ** -chunk well inside float64 range inside _ewm
+_MAX_EXPONENT = 200.0
+
+
+def _as_rows(values):
+    array = np.ascontiguousarray(values, dtype=np.float64)
+    if array.ndim == 1:
+        return array[np.newaxis, :], True
+    if array.ndim != 2:
+        raise ValueError('Expected a 1-D or 2-D array of prices')
+    return array, False
+
+
+def _first_valid(rows):
+    """Index of the first non-NaN value in each row (row length if none)"""
+    valid = ~np.isnan(rows)
+    return np.where(valid.any(axis=1), valid.argmax(axis=1), rows.shape[1])
+
+
+def _mask_warmup(result, first, periods):
+    """Blank out positions before each row has ``periods`` observations"""
+    columns = np.arange(result.shape[1])
+    result[columns[np.newaxis, :] < (first + periods - 1)[:, np.newaxis]] = np.nan
+    return result
+
+
+def _fill_leading(rows, first):
+    """Replace leading NaNs with each row's first valid value"""
+    filled = rows.copy()
+    n_rows, n_cols = rows.shape
+    for row in range(n_rows):
+        if 0 < first[row] < n_cols:
+            filled[row, :first[row]] = rows[row, first[row]]
+    return filled
+
+
+def _ewm(rows, alpha):
+    """``y[t] = (1 - alpha) * y[t-1] + alpha * x[t]`` seeded with ``y[0] = x[0]``.
+
+    The recursion is solved in closed form over chunks short enough that
+    ``decay ** -chunk`` cannot overflow, carrying the last value between
+    chunks, so there is no per-bar Python loop.
+    """
+    decay = 1.0 - alpha
+    n_cols = rows.shape[1]
+    result = np.empty_like(rows)
+    if n_cols == 0 or decay == 0:
+        result[:] = rows
+        return result
+
+    chunk = max(1, min(n_cols, int(_MAX_EXPONENT / -np.log10(decay))))
+    powers = decay ** np.arange(1, chunk + 1)
+    previous = rows[:, 0].copy()
+    for start in range(0, n_cols, chunk):
+        block = rows[:, start:start + chunk]
+        scale = powers[:block.shape[1]]
+        weighted = np.cumsum(block / scale, axis=1)
+        result[:, start:start + chunk] = scale * (previous[:, np.newaxis] + alpha * weighted)
+        previous = result[:, start + block.shape[1] - 1]
+    return result
+
+
+def ema(values, window):
+    """Exponential moving average with ``span=window`` and ``adjust=False``"""
+    rows, flat = _as_rows(values)
+    first = _first_valid(rows)
+    result = _ewm(_fill_leading(rows, first), 2.0 / (window + 1))
+    result = _mask_warmup(result, first, window)
+    return result[0] if flat else result
+
+
+def _rolling_sums(rows, first):
+    """Cumulative sums of the rows (shifted by their first value) and their squares"""
+    base = rows[np.arange(rows.shape[0]), np.minimum(first, rows.shape[1] - 1)]
+    centered = np.nan_to_num(rows - base[:, np.newaxis])
+    zeros = np.zeros((rows.shape[0], 1))
+    sums = np.concatenate([zeros, np.cumsum(centered, axis=1)], axis=1)
+    squares = np.concatenate([zeros, np.cumsum(centered * centered, axis=1)], axis=1)
+    return base, sums, squares
+
+
+def _window_mean(sums, window):
+    result = np.full((sums.shape[0], sums.shape[1] - 1), np.nan)
+    if window < sums.shape[1]:
+        result[:, window - 1:] = (sums[:, window:] - sums[:, :-window]) / window
+    return result
+
+
+def sma(values, window):
+    """Simple moving average"""
+    rows, flat = _as_rows(values)
+    first = _first_valid(rows)
+    base, sums, _ = _rolling_sums(rows, first)
+    result = _mask_warmup(_window_mean(sums, window) + base[:, np.newaxis], first, window)
+    return result[0] if flat else result
+
+
+def rsi(values, window=RSI_WINDOW):
+    """Relative Strength Index with Wilder smoothing"""
+    rows, flat = _as_rows(values)
+    result = _rsi(rows, _first_valid(rows), window)
+    return result[0] if flat else result
+
+
+def _rsi(rows, first, window):
+    diff = np.diff(rows, axis=1, prepend=np.nan)
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    avg_up = _ewm(up, 1.0 / window)
+    avg_down = _ewm(down, 1.0 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.where(avg_down == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_up / avg_down))
+    return _mask_warmup(result, first, window)
+
+
+def compute_indicators(values):
+    """Compute every indicator used by the analysis pages in shared passes.
+
+    EMA 12/26 feed MACD directly and SMA 20 doubles as the Bollinger middle
+    band; both SMAs and the band width come from one pair of cumulative sums.
+    Returns a dict of arrays shaped like ``values``.
+    """
+    rows, flat = _as_rows(values)
+    first = _first_valid(rows)
+    filled = _fill_leading(rows, first)
+
+    ema_fast = _mask_warmup(_ewm(filled, 2.0 / (MACD_FAST + 1)), first, MACD_FAST)
+    ema_slow = _mask_warmup(_ewm(filled, 2.0 / (MACD_SLOW + 1)), first, MACD_SLOW)
+    macd = ema_fast - ema_slow
+    macd_first = first + MACD_SLOW - 1
+    macd_signal = _ewm(_fill_leading(macd, np.minimum(macd_first, rows.shape[1])), 2.0 / (MACD_SIGNAL + 1))
+    macd_signal = _mask_warmup(macd_signal, macd_first, MACD_SIGNAL)
+
+    base, sums, squares = _rolling_sums(rows, first)
+    averages = {}
+    for window in sorted(set(SMA_WINDOWS) | {BB_WINDOW}):
+        averages[window] = _mask_warmup(_window_mean(sums, window), first, window)
+
+    centered_mean = averages[BB_WINDOW]
+    variance = _window_mean(squares, BB_WINDOW) - centered_mean * centered_mean
+    deviation = np.sqrt(np.maximum(variance, 0.0))
+    bb_middle = centered_mean + base[:, np.newaxis]
+
+    indicators = {
+        'rsi': _rsi(rows, first, RSI_WINDOW),
+        'macd': macd,
+        'macd_signal': macd_signal,
+        'bb_upper': bb_middle + BB_DEV * deviation,
+        'bb_lower': bb_middle - BB_DEV * deviation,
+        'bb_middle': bb_middle,
+        'ema_12': ema_fast,
+        'ema_26': ema_slow,
+    }
+    for window in SMA_WINDOWS:
+        indicators[f'sma_{window}'] = averages[window] + base[:, np.newaxis]
+
+    if flat:
+        return {name: values[0] for name, values in indicators.items()}
+    return indicators
@@ -0,0 +1,85 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+INDICES = {
+    '^GSPC': 'S&P 500',
+    '^DJI': 'Dow Jones Industrial Average',
+    '^IXIC': 'NASDAQ Composite',
+    '^VIX': 'CBOE Volatility Index',
+}
+
+
+def summarize_index(symbol, hist):
+    """Turn the last two daily bars of an index into a market overview entry"""
+    if hist is None or len(hist) < 2:
+        return None
+    current_price = float(hist['Close'].iloc[-1])
+    prev_price = float(hist['Close'].iloc[-2])
+    change = current_price - prev_price
+    change_percent = (change / prev_price) * 100
+    return {
+        'name': INDICES.get(symbol, symbol),
+        'price': round(current_price, 2),
+        'change': round(change, 2),
+        'change_percent': round(change_percent, 2),
+        'volume': int(hist['Volume'].iloc[-1]),
+    }
+
+
+class MarketOverview:
+    """Market overview kept fresh by a background thread.
+
+    The indices are fetched in parallel every ``refresh_seconds`` and readers
+    always get the last snapshot straight from memory. Only the very first
+    read waits, and at most ``cold_timeout`` seconds, for the initial refresh.
+    """
+
+    def __init__(self, fetch, indices=INDICES, refresh_seconds=60, cold_timeout=3):
+        self.fetch = fetch
+        self.indices = list(indices)
+        self.refresh_seconds = refresh_seconds
+        self.cold_timeout = cold_timeout
+        self.snapshot = {}
+        self.updated_at = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get(self):
+        """Return the latest market overview without calling upstream"""
+        self.start()
+        self._ready.wait(self.cold_timeout)
+        return self.snapshot
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='market-overview', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_seconds)
+
+    def refresh(self):
+        """Fetch every index concurrently and swap in the new snapshot"""
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.indices)) as pool:
+                histories = list(pool.map(self.fetch, self.indices))
+
+            # Indices that failed this round keep their previous entry
+            market_data = dict(self.snapshot)
+            for symbol, hist in zip(self.indices, histories):
+                entry = summarize_index(symbol, hist)
+                if entry is not None:
+                    market_data[symbol] = entry
+
+            self.snapshot = market_data
+            self.updated_at = time.time()
+        except Exception as e:
+            print(f"Error fetching market data: {e}")
+        finally:
+            self._ready.set()
+        return self.snapshot
@@ -0,0 +1,169 @@
+"""Request timing spans, latency histograms and a Prometheus text exporter.
+
+Code wraps each stage of a request in ``span``:
+
+    with span('fetch'):
+        data = get_stock_data(symbol)
+
+Every span is observed into a per-endpoint, per-stage histogram, and the
+spans of the current request are kept so they can be sent back in a
+``Server-Timing`` header. Spans outside a request (background refreshes)
+are recorded under the ``background`` endpoint. Counters owned by other
+components (caches, the upstream scheduler) are read at scrape time from
+their ``stats()`` through ``register_collector``.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; from a cached analysis (sub-millisecond) to a throttled upstream fetch
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_request = contextvars.ContextVar('metrics_request', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, seconds):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for label_values, counts, total in series:
+            labels = _labels(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_labels(zip(self.labels, label_values), le=le)} {cumulative}')
+            lines.append(f'{self.name}_sum{labels} {total:.6f}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class RequestTimer:
+    """Spans of one request, in the order they finished"""
+    __slots__ = ('endpoint', 'started', 'spans')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def server_timing(self):
+        """``Server-Timing`` header value; repeated stages are summed"""
+        totals = {}
+        for stage, seconds in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        totals['total'] = time.perf_counter() - self.started
+        return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in totals.items())
+
+
+class Metrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.requests = Histogram('stock_tracker_request_duration_seconds',
+                                  'Time to produce a response, by endpoint and status code',
+                                  ('endpoint', 'method', 'status'), buckets)
+        self.stages = Histogram('stock_tracker_stage_duration_seconds',
+                                'Time spent in one stage of a request, by endpoint and stage',
+                                ('endpoint', 'stage'), buckets)
+        self._collectors = {}
+
+    def register_collector(self, prefix, stats):
+        """Export the numeric values of ``stats()`` (nested dicts allowed) as ``<prefix>_<key>``"""
+        self._collectors[prefix] = stats
+
+    def start_request(self, endpoint):
+        timer = RequestTimer(endpoint or 'unknown')
+        _request.set(timer)
+        return timer
+
+    def finish_request(self, method, status):
+        """Observe the current request's total time and return its timer (or None)"""
+        timer = _request.get()
+        if timer is None:
+            return None
+        _request.set(None)
+        self.requests.observe((timer.endpoint, method, str(status)), time.perf_counter() - timer.started)
+        return timer
+
+    @contextmanager
+    def span(self, stage):
+        timer = _request.get()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.stages.observe((timer.endpoint if timer else 'background', stage), seconds)
+            if timer is not None:
+                timer.spans.append((stage, seconds))
+
+    def render(self):
+        """Everything in the Prometheus text exposition format"""
+        lines = self.requests.render() + self.stages.render()
+        for prefix, stats in self._collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                print(f"Error collecting {prefix} metrics: {e}")
+                continue
+            for name, labels, value in sorted(_flatten(prefix, values)):
+                lines.append(f'# TYPE {name} {"counter" if _is_counter(name) else "gauge"}')
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Cumulative counts in the components' stats(); everything else is a point-in-time gauge
+COUNTER_SUFFIXES = ('_hits', '_misses', '_evictions', '_calls', '_executions', '_shared',
+                    '_executed', '_failed', '_rejected', '_throttled_seconds', '_builds')
+
+
+def _is_counter(name):
+    return name.endswith(COUNTER_SUFFIXES)
+
+
+def _flatten(prefix, values):
+    for key, value in values.items():
+        name = f'{prefix}_{key}'
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, bool):
+            yield name, '', int(value)
+        elif isinstance(value, (int, float)):
+            yield name, '', value
+        elif isinstance(value, str):
+            # Enumerations such as the circuit state are exported as a labelled 1
+            yield name, _labels([('state', value)]), 1
+
+
+def _labels(pairs, **extra):
+    items = [f'{key}="{_escape(value)}"' for key, value in pairs]
+    items += [f'{key}="{value}"' for key, value in extra.items()]
+    return '{' + ','.join(items) + '}' if items else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
+span = metrics.span
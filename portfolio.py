@@ -0,0 +1,76 @@
+"""Portfolio valuation.
+
+Lots are aggregated per symbol in SQL, so the database does the summing
+over an index instead of the app loading every row, and the positions
+are then valued against cached quotes in one pass.
+"""
+from sqlalchemy import func
+
+from quotes import value_holdings
+
+
+def load_lots(session, model, user_id):
+    """Per-lot (id, symbol, quantity, avg_price) rows for one user, without building ORM objects"""
+    return (session.query(model.id, model.symbol, model.quantity, model.avg_price)
+            .filter(model.user_id == user_id)
+            .order_by(model.id)
+            .all())
+
+
+def load_positions(session, model, user_id):
+    """Per-symbol (symbol, lots, quantity, cost) rows for one user, summed by the database"""
+    return (session.query(model.symbol,
+                          func.count(model.id).label('lots'),
+                          func.sum(model.quantity).label('quantity'),
+                          func.sum(model.quantity * model.avg_price).label('cost'))
+            .filter(model.user_id == user_id)
+            .group_by(model.symbol)
+            .order_by(model.symbol)
+            .all())
+
+
+def value_positions(positions, quotes):
+    """Value per-symbol positions against ``quotes`` and weight each by its share of the total"""
+    valued = []
+    for position in positions:
+        quote = quotes.get(position.symbol.upper())
+        quantity = position.quantity or 0.0
+        cost = position.cost or 0.0
+        row = {
+            'symbol': position.symbol,
+            'lots': position.lots,
+            'quantity': quantity,
+            'avg_price': round(cost / quantity, 4) if quantity else 0.0,
+            'cost': round(cost, 2),
+        }
+        if quote is None:
+            row['error'] = True
+        else:
+            value = quantity * quote['price']
+            row.update({
+                'price': round(quote['price'], 4),
+                'value': value,
+                'profit_loss': round(value - cost, 2),
+                'profit_loss_percent': round(((value - cost) / cost) * 100, 2) if cost else 0.0,
+            })
+        valued.append(row)
+
+    total_value = sum(row['value'] for row in valued if 'value' in row)
+    for row in valued:
+        if 'value' in row:
+            row['weight'] = round(row['value'] / total_value, 4) if total_value else 0.0
+            row['value'] = round(row['value'], 2)
+    valued.sort(key=lambda row: row.get('value', 0.0), reverse=True)
+    return valued
+
+
+def value_portfolio(session, model, user_id, get_quotes):
+    """Totals, per-lot P&L and per-symbol positions with allocation weights for one user"""
+    lots = load_lots(session, model, user_id)
+    positions = load_positions(session, model, user_id)
+    quotes = get_quotes([position.symbol for position in positions])
+
+    portfolio = value_holdings(lots, quotes)
+    portfolio['positions'] = value_positions(positions, quotes)
+    portfolio['quotes'] = quotes
+    return portfolio
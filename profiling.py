@@ -0,0 +1,140 @@
+"""On-demand request profiling.
+
+A ``SamplingProfiler`` walks the stack of the request's thread every few
+milliseconds from a helper thread and counts identical stacks, which is
+cheap enough to run on production traffic. ``DeterministicProfiler``
+wraps cProfile for exact call counts. Captures are written to one
+directory with the route and symbol in the file name:
+
+    20261017-142501-123456_analyze_stock_AAPL.folded   (sampling)
+    20261017-142501-123456_analyze_stock_AAPL.prof     (cProfile)
+
+``.folded`` files are in the collapsed-stack format read by
+flamegraph.pl, speedscope and inferno; ``.prof`` files open in pstats or
+snakeviz.
+"""
+import cProfile
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+
+SAMPLE_INTERVAL = 0.005
+PROFILE_EXTENSIONS = ('.folded', '.prof')
+SAFE_NAME = re.compile(r'[^A-Za-z0-9^._=-]+')
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every ``interval`` seconds"""
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class DeterministicProfiler:
+    """cProfile around the request; exact but several times slower"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+        return self
+
+    def stop(self):
+        self.profile.disable()
+
+    def save(self, path):
+        self.profile.dump_stats(path)
+
+
+PROFILERS = {'sample': ('.folded', SamplingProfiler), 'cprofile': ('.prof', DeterministicProfiler)}
+
+
+class ProfileStore:
+    """Directory of captures, pruned to the newest ``keep`` files"""
+
+    def __init__(self, directory, keep=200):
+        self.directory = directory
+        self.keep = keep
+
+    def save(self, profiler, mode, route, symbol=None):
+        os.makedirs(self.directory, exist_ok=True)
+        parts = [datetime.now().strftime('%Y%m%d-%H%M%S-%f'), route] + ([symbol] if symbol else [])
+        name = SAFE_NAME.sub('-', '_'.join(parts)) + PROFILERS[mode][0]
+        profiler.save(os.path.join(self.directory, name))
+        self.prune()
+        return name
+
+    def list(self, limit=None):
+        """Newest first: {'name', 'size', 'created'} for every capture"""
+        if not os.path.isdir(self.directory):
+            return []
+        captures = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(PROFILE_EXTENSIONS):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            captures.append({'name': name, 'size': stat.st_size,
+                             'created': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')})
+        captures.sort(key=lambda capture: capture['name'], reverse=True)
+        return captures[:limit] if limit else captures
+
+    def path(self, name):
+        """Full path of a capture, or None for names that are not plain capture files"""
+        if os.path.basename(name) != name or not name.endswith(PROFILE_EXTENSIONS):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def prune(self):
+        for capture in self.list()[self.keep:]:
+            try:
+                os.remove(os.path.join(self.directory, capture['name']))
+            except OSError:
+                pass
+
+
+def start_profiler(mode):
+    """A running profiler for ``mode``, or None if one cannot be started"""
+    try:
+        return PROFILERS[mode][1]().start()
+    except ValueError as e:
+        # Only one cProfile can be active per process on Python 3.12+
+        print(f"Error starting {mode} profiler: {e}")
+        return None
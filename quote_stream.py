@@ -0,0 +1,119 @@
+import queue
+import threading
+
+
+class Subscription:
+    """One client's view of the hub: a queue of quote changes for its symbols.
+
+    A symbol maps to ``None`` when the first refresh after subscribing found
+    no quote for it, so the client can stop waiting for that row.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = frozenset(symbols)
+        # Symbols that have not been delivered yet, quote or failure
+        self.pending = set(self.symbols)
+        self._queue = queue.Queue()
+
+    def push(self, changes):
+        self._queue.put(changes)
+
+    def get(self, timeout=None):
+        """Block until changes arrive (or ``timeout``), merging everything queued meanwhile"""
+        try:
+            changes = dict(self._queue.get(timeout=timeout))
+        except queue.Empty:
+            return {}
+        while True:
+            try:
+                changes.update(self._queue.get_nowait())
+            except queue.Empty:
+                return changes
+
+
+class QuoteHub:
+    """Fans quote updates out to every subscriber.
+
+    A single refresher thread polls upstream for the distinct symbols that
+    currently have subscribers, once per ``interval`` and in one batch, and
+    pushes only quotes that changed. Upstream load therefore depends on how
+    many distinct symbols are watched, not on how many tabs are open.
+    """
+
+    def __init__(self, fetch, interval=10):
+        self.fetch = fetch
+        self.interval = interval
+        self._subscribers = {}
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def subscribe(self, symbols):
+        subscription = Subscription(symbol.upper() for symbol in symbols)
+        with self._lock:
+            for symbol in subscription.symbols:
+                self._subscribers.setdefault(symbol, set()).add(subscription)
+            snapshot = {s: self._latest[s] for s in subscription.symbols if s in self._latest}
+            subscription.pending.difference_update(snapshot)
+            missing = bool(subscription.pending)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='quote-hub', daemon=True)
+                self._thread.start()
+
+        if snapshot:
+            subscription.push(snapshot)
+        if missing:
+            self._wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for symbol in subscription.symbols:
+                subscribers = self._subscribers.get(symbol)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[symbol]
+                    self._latest.pop(symbol, None)
+
+    def watched_symbols(self):
+        with self._lock:
+            return sorted(self._subscribers)
+
+    def _run(self):
+        while True:
+            symbols = self.watched_symbols()
+            if symbols:
+                self.refresh(symbols)
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def refresh(self, symbols):
+        try:
+            quotes = self.fetch(symbols)
+        except Exception as e:
+            print(f"Error refreshing streamed quotes: {e}")
+            quotes = {}
+
+        deliveries = {}
+        with self._lock:
+            for symbol, quote in quotes.items():
+                if self._latest.get(symbol) == quote or symbol not in self._subscribers:
+                    continue
+                self._latest[symbol] = quote
+                for subscription in self._subscribers[symbol]:
+                    deliveries.setdefault(subscription, {})[symbol] = quote
+
+            # Tell new subscribers once which of their symbols this refresh could not quote
+            failed = set(symbols).difference(quotes)
+            for symbol in failed:
+                for subscription in self._subscribers.get(symbol, ()):
+                    if symbol in subscription.pending:
+                        deliveries.setdefault(subscription, {})[symbol] = None
+            for subscription, changes in deliveries.items():
+                subscription.pending.difference_update(changes)
+
+        for subscription, changes in deliveries.items():
+            subscription.push(changes)
@@ -0,0 +1,102 @@
+import threading
+import time
+
+from singleflight import SingleFlight
+from sources import get_source
+
+_cache = {}
+_lock = threading.Lock()
+# Dashboards opened together ask for the same stale symbols at the same moment
+quote_fetches = SingleFlight()
+
+
+def _quote_from_closes(closes):
+    closes = closes.dropna()
+    if closes.empty:
+        return None
+    price = float(closes.iloc[-1])
+    prev_close = float(closes.iloc[-2]) if len(closes) > 1 else price
+    change = price - prev_close
+    return {
+        'price': price,
+        'prev_close': prev_close,
+        'change': change,
+        'change_percent': (change / prev_close) * 100 if prev_close else 0.0,
+    }
+
+
+def download_quotes(symbols):
+    """Fetch last and previous close for many symbols in one multi-ticker download"""
+    if not symbols:
+        return {}
+    data = get_source().download(list(symbols), period='5d', group_by='ticker',
+                                 auto_adjust=True, progress=False, threads=True)
+    if data is None or data.empty:
+        return {}
+
+    quotes = {}
+    for symbol in symbols:
+        try:
+            closes = data[symbol]['Close'] if data.columns.nlevels > 1 else data['Close']
+        except KeyError:
+            continue
+        quote = _quote_from_closes(closes)
+        if quote is not None:
+            quotes[symbol] = quote
+    return quotes
+
+
+def get_quotes(symbols, max_age=15):
+    """Return quotes for ``symbols``, downloading only the ones older than ``max_age`` seconds"""
+    symbols = sorted({symbol.upper() for symbol in symbols})
+    now = time.time()
+    with _lock:
+        stale = [s for s in symbols if s not in _cache or now - _cache[s][0] >= max_age]
+
+    if stale:
+        try:
+            fresh = quote_fetches.do(tuple(stale), download_quotes, stale)
+        except Exception as e:
+            print(f"Error fetching quotes for {', '.join(stale)}: {e}")
+            fresh = {}
+        with _lock:
+            for symbol, quote in fresh.items():
+                _cache[symbol] = (now, quote)
+
+    with _lock:
+        return {s: _cache[s][1] for s in symbols if s in _cache}
+
+
+def value_holdings(stocks, quotes):
+    """Compute per-lot and total P&L for ``Stock`` rows against ``quotes``"""
+    holdings = []
+    total_cost = 0.0
+    total_value = 0.0
+    for stock in stocks:
+        quote = quotes.get(stock.symbol.upper())
+        if quote is None:
+            holdings.append({'id': stock.id, 'symbol': stock.symbol, 'error': True})
+            continue
+
+        cost = stock.quantity * stock.avg_price
+        value = stock.quantity * quote['price']
+        profit_loss = value - cost
+        total_cost += cost
+        total_value += value
+        holdings.append({
+            'id': stock.id,
+            'symbol': stock.symbol,
+            'price': round(quote['price'], 4),
+            'value': round(value, 2),
+            'profit_loss': round(profit_loss, 2),
+            'profit_loss_percent': round((profit_loss / cost) * 100, 2) if cost else 0.0,
+        })
+
+    total_profit_loss = total_value - total_cost
+    return {
+        'holdings': holdings,
+        'total_cost': round(total_cost, 2),
+        'total_value': round(total_value, 2),
+        'total_profit_loss': round(total_profit_loss, 2),
+        'total_profit_loss_percent': round((total_profit_loss / total_cost) * 100, 2) if total_cost else 0.0,
+    }
@@ -0,0 +1,116 @@
+"""Bars at other intervals built from one stored base series.
+
+Weekly, monthly and quarterly bars come from the daily series and 15m,
+30m and 1h bars from the 5m series, so every interval of a symbol is
+served by the two series the bar store already keeps. Buckets are
+labelled by their start like Yahoo Finance's own bars (weeks on Monday,
+months on the 1st, hours on the half hour the session opens on).
+
+Only the last bucket can still change when the base series grows, so a
+``Resampler`` keeps each result and re-aggregates just that bucket and
+anything after it.
+"""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# interval -> (base interval, pandas rule, rule offset)
+INTERVALS = {
+    '5m': ('5m', None, None),
+    '15m': ('5m', '15min', None),
+    '30m': ('5m', '30min', None),
+    '1h': ('5m', '60min', '30min'),
+    '1d': ('1d', None, None),
+    '1wk': ('1d', 'W-MON', None),
+    '1mo': ('1d', 'MS', None),
+    '3mo': ('1d', 'QS', None),
+}
+DEFAULT_PERIODS = {'5m': '5d', '15m': '1mo', '30m': '1mo', '1h': '1mo',
+                   '1d': '1y', '1wk': '5y', '1mo': 'max', '3mo': 'max'}
+# Yahoo Finance keeps 5-minute bars for the last 60 days only (see bar_store.INTRADAY_DAYS)
+INTRADAY_PERIODS = ('1d', '5d', '1mo', '60d')
+AGGREGATION = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+
+def is_intraday(interval):
+    return INTERVALS[interval][0] != '1d'
+
+
+def supported(interval, period):
+    """Whether bars at ``interval`` can be built for ``period`` from the stored base series"""
+    if interval not in INTERVALS:
+        return False
+    return period in INTRADAY_PERIODS if is_intraday(interval) else True
+
+
+def aggregate(data, rule, offset=None):
+    """OHLCV buckets of ``rule``, labelled by their start; empty buckets are dropped"""
+    bars = data.resample(rule, closed='left', label='left', offset=offset).agg(AGGREGATION)
+    return bars.dropna(subset=['Close'])
+
+
+class Resampler:
+    """Keeps resampled series and updates only their open bucket as base bars arrive"""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.full = 0
+        self.incremental = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resample(self, key, base, interval):
+        """``base`` bars at ``interval``; ``key`` identifies the base series (symbol, period, ...)"""
+        _, rule, offset = INTERVALS[interval]
+        if rule is None or base is None or base.empty:
+            return base
+
+        key = (key, interval)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        bars = self._update(entry, base, rule, offset) if entry is not None else None
+        if bars is None:
+            bars = aggregate(base, rule, offset)
+            with self._lock:
+                self.full += 1
+        else:
+            with self._lock:
+                self.incremental += 1
+
+        # Everything up to the last closed bucket must match next time for the cached bars to be reused
+        open_start = bars.index[-1] if len(bars) else None
+        before = base.index < open_start if open_start is not None else None
+        boundary = base[before].iloc[-1] if before is not None and before.any() else None
+        entry = (bars, base.index[0],
+                 None if boundary is None else (boundary.name, float(boundary['Close']), int(before.sum())))
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return bars
+
+    @staticmethod
+    def _update(entry, base, rule, offset):
+        bars, first, boundary = entry
+        if boundary is None or base.index[0] != first:
+            return None
+        timestamp, close, position = boundary
+        # A re-download (split, dividend) rewrites history, so the closed buckets are checked at their edge
+        if (len(base) <= position or base.index[position - 1] != timestamp
+                or float(base['Close'].iloc[position - 1]) != close):
+            return None
+        open_start = bars.index[-1]
+        tail = aggregate(base.iloc[position:], rule, offset)
+        return pd.concat([bars[bars.index < open_start], tail])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'full_builds': self.full, 'incremental_builds': self.incremental, 'size': len(self._entries)}
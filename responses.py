@@ -0,0 +1,133 @@
+"""Data endpoint responses in the format the client asks for.
+
+JSON stays the default and is written by orjson, which encodes NumPy
+arrays directly instead of going through Python lists and floats.
+Clients that send ``Accept: application/vnd.stock-tracker.columns`` get
+the same payload as one binary message: a JSON header with every array
+replaced by ``{"$column": n}`` and a ``[type, length]`` entry per
+column, followed by the columns themselves, packed little-endian and
+8-byte aligned so the browser can view them as typed arrays.
+
+    STKWIRE1 | uint32 header length | header JSON | column | column | ...
+
+Prices go out as float32 whenever that still rounds back to the value
+the JSON would carry, integers as int32 and dates as float64 milliseconds
+of exchange-local time, so the decoded payload equals the JSON one.
+"""
+import numpy as np
+import orjson
+from flask import Response, request
+
+JSON_MIMETYPE = 'application/json'
+COLUMNS_MIMETYPE = 'application/vnd.stock-tracker.columns'
+MAGIC = b'STKWIRE1'
+ALIGNMENT = 8
+# Payload prices are rounded to 4 decimals, and the browser rounds float32 columns back to them
+DECIMALS = 4
+COLUMN_TYPES = {'f4': '<f4', 'f8': '<f8', 'i4': '<i4', 'date': '<f8', 'datetime': '<f8'}
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def wants_columns():
+    """Whether the request prefers packed columns to JSON (JSON wins ties such as ``*/*``)"""
+    return request.accept_mimetypes.best_match([JSON_MIMETYPE, COLUMNS_MIMETYPE]) == COLUMNS_MIMETYPE
+
+
+def respond(payload, status=200):
+    """``payload`` encoded in the format negotiated with the client"""
+    if wants_columns():
+        response = Response(encode_columns(payload), status=status, mimetype=COLUMNS_MIMETYPE)
+    else:
+        response = Response(encode_json(payload), status=status, mimetype=JSON_MIMETYPE)
+    response.vary.add('Accept')
+    return response
+
+
+def encode_json(payload):
+    return orjson.dumps(_walk(payload, _json_array), option=JSON_OPTIONS)
+
+
+def encode_columns(payload):
+    columns = []
+
+    def add(array):
+        columns.append(_column(array))
+        return {'$column': len(columns) - 1}
+
+    tree = _walk(payload, add)
+    header = orjson.dumps({'columns': [[kind, len(data)] for kind, data in columns], 'payload': tree},
+                          option=JSON_OPTIONS)
+    parts = [_pad(MAGIC + len(header).to_bytes(4, 'little') + header)]
+    parts.extend(_pad(data.tobytes()) for _, data in columns)
+    return b''.join(parts)
+
+
+def decode_columns(data):
+    """The payload of an ``encode_columns`` message, with arrays as the browser decodes them"""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a packed column message')
+    length = int.from_bytes(data[len(MAGIC):len(MAGIC) + 4], 'little')
+    start = len(MAGIC) + 4
+    header = orjson.loads(data[start:start + length])
+    offset = start + length
+    columns = []
+    for kind, count in header['columns']:
+        offset += -offset % ALIGNMENT
+        dtype = np.dtype(COLUMN_TYPES[kind])
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes
+        if kind == 'f4':
+            array = np.round(array.astype(np.float64), DECIMALS)
+        elif kind in ('date', 'datetime'):
+            array = array.astype(np.int64).astype('datetime64[ms]').astype(
+                'datetime64[D]' if kind == 'date' else 'datetime64[m]')
+        columns.append(array)
+    return _walk_columns(header['payload'], columns)
+
+
+def _walk_columns(value, columns):
+    if isinstance(value, dict):
+        if set(value) == {'$column'}:
+            return columns[value['$column']]
+        return {key: _walk_columns(item, columns) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_walk_columns(item, columns) for item in value]
+    return value
+
+
+def _walk(value, leaf):
+    if isinstance(value, np.ndarray):
+        return leaf(value)
+    if isinstance(value, dict):
+        return {key: _walk(item, leaf) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_walk(item, leaf) for item in value]
+    return value
+
+
+def _json_array(array):
+    if array.dtype.kind == 'M':
+        # orjson writes datetime64 as full ISO timestamps; the charts use the shorter form
+        dates = np.datetime_as_string(array)
+        return (np.char.replace(dates, 'T', ' ') if np.datetime_data(array.dtype)[0] != 'D' else dates).tolist()
+    return np.ascontiguousarray(array)
+
+
+def _column(array):
+    """(type, little-endian array) for one column"""
+    if array.dtype.kind == 'M':
+        kind = 'date' if np.datetime_data(array.dtype)[0] == 'D' else 'datetime'
+        return kind, array.astype('datetime64[ms]').astype(np.int64).astype('<f8')
+    if array.dtype.kind in 'biu':
+        if not len(array) or (array.min() >= np.iinfo(np.int32).min and array.max() <= np.iinfo(np.int32).max):
+            return 'i4', array.astype('<i4')
+        return 'f8', array.astype('<f8')
+    values = array.astype('<f8')
+    single = values.astype('<f4')
+    if np.array_equal(np.round(single.astype('<f8'), DECIMALS), values, equal_nan=True):
+        return 'f4', single
+    return 'f8', values
+
+
+def _pad(data):
+    return data + b'\0' * (-len(data) % ALIGNMENT)
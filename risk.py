@@ -0,0 +1,147 @@
+"""Portfolio risk from daily returns.
+
+Closes of every held symbol and of the benchmark are aligned on the
+sessions they share into one returns matrix (sessions x symbols), and
+every statistic is computed on that matrix in one pass: covariance and
+correlation, portfolio volatility, betas, historical and parametric VaR
+and drawdowns, for the portfolio and each holding.
+
+Returns depend only on the stored bars, not on who holds them, so both
+the per-symbol series and the aligned matrix are cached under keys built
+from the bars' last timestamp and close: users holding the same symbols
+share a matrix, and users with overlapping holdings share its columns.
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK = '^GSPC'
+TRADING_DAYS = 252
+# Fewer shared sessions than this give meaningless covariances
+MIN_OBSERVATIONS = 20
+
+
+def daily_returns(data):
+    """Simple close-to-close returns indexed by session date"""
+    closes = data['Close'].dropna()
+    dates = closes.index.tz_localize(None) if closes.index.tz is not None else closes.index
+    closes = pd.Series(closes.to_numpy(dtype=float), index=dates.normalize())
+    return closes.pct_change().iloc[1:]
+
+
+def load_returns(symbols, period, get_stock_data, cache):
+    """Aligned returns of ``symbols`` and the benchmark as (dates, symbols, matrix, last closes).
+
+    Symbols without history are left out of the matrix; the benchmark is its last column.
+    """
+    series, closes, versions = {}, {}, []
+    for symbol in sorted({symbol.upper() for symbol in symbols} | {BENCHMARK}):
+        data = get_stock_data(symbol, period)
+        if data is None or len(data) < 2:
+            continue
+        version = (symbol, len(data), data.index[-1].value, float(data['Close'].iloc[-1]))
+        series[symbol] = cache.get_or_compute(('returns', period) + version, lambda: daily_returns(data))
+        closes[symbol] = version[3]
+        versions.append(version)
+    if BENCHMARK not in series:
+        return None
+
+    def align():
+        columns = [symbol for symbol in series if symbol != BENCHMARK] + [BENCHMARK]
+        frame = pd.concat([series[symbol] for symbol in columns], axis=1, join='inner', keys=columns).dropna()
+        return frame.index, columns, np.ascontiguousarray(frame.to_numpy(dtype=np.float64))
+
+    dates, columns, matrix = cache.get_or_compute(('matrix', period, tuple(versions)), align)
+    return dates, columns, matrix, closes
+
+
+def max_drawdown(returns):
+    """Largest peak-to-trough loss of each column of ``returns`` (a positive fraction)"""
+    wealth = np.cumprod(1.0 + returns, axis=0)
+    peaks = np.maximum.accumulate(np.maximum(wealth, 1.0), axis=0)
+    return -(wealth / peaks - 1.0).min(axis=0)
+
+
+def portfolio_risk(returns, weights, confidence=0.95, horizon=1):
+    """Risk of holding ``weights`` of the first columns of ``returns``; the last column is the benchmark.
+
+    VaR and expected shortfall are losses over ``horizon`` sessions at
+    ``confidence``, as positive fractions of the portfolio value. Historical
+    figures scale the daily loss by the square root of ``horizon``; the
+    parametric VaR scales the volatility that way and the mean return linearly.
+    """
+    assets, benchmark = returns[:, :-1], returns[:, -1]
+    portfolio = assets @ weights
+
+    covariance = np.cov(assets, rowvar=False, ddof=1).reshape(len(weights), len(weights))
+    volatility = np.sqrt(np.diag(covariance))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = covariance / np.outer(volatility, volatility)
+    portfolio_volatility = float(np.sqrt(weights @ covariance @ weights))
+
+    centered = returns - returns.mean(axis=0)
+    benchmark_variance = centered[:, -1] @ centered[:, -1]
+    betas = centered[:, :-1].T @ centered[:, -1] / benchmark_variance if benchmark_variance else np.zeros(len(weights))
+
+    scale = np.sqrt(horizon)
+    cutoff = np.quantile(portfolio, 1 - confidence)
+    z = NormalDist().inv_cdf(confidence)
+    return {
+        'volatility': portfolio_volatility,
+        'volatility_annual': portfolio_volatility * np.sqrt(TRADING_DAYS),
+        'beta': float(betas @ weights),
+        'var_historical': float(-cutoff * scale),
+        'expected_shortfall': float(-portfolio[portfolio <= cutoff].mean() * scale),
+        'var_parametric': float(z * portfolio_volatility * scale - portfolio.mean() * horizon),
+        'max_drawdown': float(max_drawdown(portfolio[:, None])[0]),
+        'benchmark_max_drawdown': float(max_drawdown(benchmark[:, None])[0]),
+        'holdings': {
+            'volatility_annual': volatility * np.sqrt(TRADING_DAYS),
+            'beta': betas,
+            'max_drawdown': max_drawdown(assets),
+            # Share of the portfolio variance each holding contributes; sums to 1
+            'risk_contribution': (weights * (covariance @ weights) / portfolio_volatility ** 2
+                                  if portfolio_volatility else np.zeros(len(weights))),
+        },
+        'covariance_annual': covariance * TRADING_DAYS,
+        'correlation': np.nan_to_num(correlation),
+    }
+
+
+def analyze_portfolio(positions, period, get_stock_data, cache, confidence=0.95, horizon=1):
+    """Risk report for per-symbol ``positions`` (as ``portfolio.load_positions`` returns), or None"""
+    quantities = {}
+    for position in positions:
+        symbol = position.symbol.upper()
+        quantities[symbol] = quantities.get(symbol, 0.0) + (position.quantity or 0.0)
+
+    loaded = load_returns(list(quantities), period, get_stock_data, cache)
+    if loaded is None:
+        return None
+    dates, columns, matrix, closes = loaded
+    held = columns[:-1]
+    missing = sorted(set(quantities) - set(held))
+    if not held or len(dates) < MIN_OBSERVATIONS:
+        return {'symbols': [], 'missing': sorted(quantities), 'observations': len(dates)}
+
+    values = np.array([quantities[symbol] * closes[symbol] for symbol in held])
+    total = values.sum()
+    weights = values / total if total else np.full(len(held), 1.0 / len(held))
+
+    report = portfolio_risk(matrix, weights, confidence=confidence, horizon=horizon)
+    report.update({
+        'symbols': held,
+        'missing': missing,
+        'benchmark': BENCHMARK,
+        'weights': weights,
+        'value': float(total),
+        'var_historical_amount': report['var_historical'] * float(total),
+        'var_parametric_amount': report['var_parametric'] * float(total),
+        'confidence': confidence,
+        'horizon': horizon,
+        'observations': len(dates),
+        'start': dates[0].strftime('%Y-%m-%d'),
+        'end': dates[-1].strftime('%Y-%m-%d'),
+    })
+    return report
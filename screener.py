@@ -0,0 +1,161 @@
+"""Run the trading recommendation over a whole universe of symbols.
+
+Data loading and indicator computation fan out over the shared worker
+pool (see ``workers``).
+
+    python screener.py --universe sp500 --signal buy --limit 20
+    python screener.py --file watchlist.txt
+"""
+import argparse
+import math
+import os
+import sqlite3
+import time
+from io import StringIO
+
+import workers
+from analysis import calculate_technical_indicators, generate_trading_recommendation
+
+SP500_URL = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
+SP500_MAX_AGE = 7 * 24 * 3600
+
+SIGNALS = {'buy': 'קנייה', 'sell': 'מכירה', 'hold': 'החזקה'}
+
+
+def load_sp500(cache_path):
+    """Return S&P 500 tickers, refreshing the cached list from Wikipedia once a week"""
+    if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < SP500_MAX_AGE:
+        return load_symbol_file(cache_path)
+
+    import pandas as pd
+    import requests
+
+    try:
+        response = requests.get(SP500_URL, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
+        response.raise_for_status()
+        table = pd.read_html(StringIO(response.text))[0]
+        symbols = [symbol.replace('.', '-') for symbol in table['Symbol'].astype(str)]
+    except Exception as e:
+        print(f"Error fetching S&P 500 constituents: {e}")
+        return load_symbol_file(cache_path) if os.path.exists(cache_path) else []
+
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    with open(cache_path, 'w') as f:
+        f.write('\n'.join(symbols) + '\n')
+    return symbols
+
+
+def load_symbol_file(path):
+    """Read one symbol per line (or comma separated), ignoring blanks and # comments"""
+    symbols = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            symbols.extend(part.strip().upper() for part in line.split(',') if part.strip())
+    return symbols
+
+
+def load_stock_table_symbols(db_path):
+    """Every distinct symbol held by any user"""
+    with sqlite3.connect(db_path) as conn:
+        return [row[0] for row in conn.execute('SELECT DISTINCT symbol FROM stock ORDER BY symbol')]
+
+
+def resolve_symbols(instance_path, universe='sp500', symbols=None, file=None, held=None):
+    """Symbols named by ``symbols`` (comma separated), ``file`` or ``universe``; None for an unknown universe.
+
+    ``held(universe)`` lists the symbols users hold ('stocks', 'portfolio'); without it
+    'stocks' is read from the app database in ``instance_path``.
+    """
+    if symbols:
+        return [s.strip() for s in symbols.split(',') if s.strip()]
+    if file:
+        return load_symbol_file(file)
+    if universe == 'sp500':
+        return load_sp500(os.path.join(instance_path, 'sp500.txt'))
+    if held is not None:
+        return held(universe)
+    if universe == 'stocks':
+        return load_stock_table_symbols(os.path.join(instance_path, 'stocks.db'))
+    return None
+
+
+def add_universe_arguments(parser):
+    """The symbol selection and pool options shared by the screener and backtest CLIs"""
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--universe', choices=['sp500', 'stocks'], default='sp500')
+    source.add_argument('--file', help='file with one symbol per line')
+    source.add_argument('--symbols', help='comma separated symbols')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--instance', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance'))
+
+
+def _screen_symbol(symbol, period='1y'):
+    """Load one symbol and score it (runs inside a pool worker)"""
+    try:
+        data = workers.get_store().get_bars(symbol, period)
+        if data is None or len(data) < 2:
+            return None
+        indicators = calculate_technical_indicators(data)
+        recommendation = generate_trading_recommendation(data, indicators)
+    except Exception as e:
+        print(f"Error screening {symbol}: {e}")
+        return None
+
+    price = float(data['Close'].iloc[-1])
+    prev_price = float(data['Close'].iloc[-2])
+    rsi = float(indicators['rsi'].iloc[-1])
+    return {
+        'symbol': symbol.upper(),
+        'price': price,
+        'change_percent': (price - prev_price) / prev_price * 100,
+        'rsi': None if math.isnan(rsi) else rsi,
+        'recommendation': recommendation['recommendation'],
+        'confidence': recommendation['confidence'],
+        'strength': recommendation['strength'],
+        'signals': recommendation['signals'],
+    }
+
+
+def rank(results, signal=None, limit=None):
+    """Filter by recommendation and sort by strength (weakest first for sell)"""
+    results = [r for r in results if r is not None]
+    if signal:
+        results = [r for r in results if r['recommendation'] == SIGNALS[signal]]
+    if signal == 'sell':
+        results.sort(key=lambda r: (r['strength'], r['symbol']))
+    else:
+        results.sort(key=lambda r: (-r['strength'], r['symbol']))
+    return results[:limit] if limit else results
+
+
+def screen(symbols, executor, period='1y', signal=None, limit=None):
+    """Score ``symbols`` on ``executor`` and return them ranked by strength"""
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    results = executor.map(_screen_symbol, symbols, [period] * len(symbols),
+                           chunksize=workers.chunksize(len(symbols)))
+    return rank(list(results), signal=signal, limit=limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rank a universe of symbols by recommendation strength')
+    add_universe_arguments(parser)
+    parser.add_argument('--signal', choices=sorted(SIGNALS))
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--period', default='1y')
+    args = parser.parse_args()
+
+    symbols = resolve_symbols(args.instance, args.universe, args.symbols, args.file)
+    started = time.perf_counter()
+    with workers.open_pool(args.instance, args.workers) as executor:
+        results = screen(symbols, executor, period=args.period, signal=args.signal, limit=args.limit)
+
+    for r in results:
+        rsi = f"{r['rsi']:.1f}" if r['rsi'] is not None else '-'
+        print(f"{r['symbol']:<8} {r['strength']:>3} {r['recommendation']:<6} "
+              f"{r['price']:>10.2f} {r['change_percent']:>+7.2f}% RSI {rsi}")
+    print(f"{len(results)} of {len(symbols)} symbols in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Per-bar recommendation scores as arrays.
+
+Applies the same rules as ``analysis.score_recommendation`` (RSI 30/70,
+MACD vs signal, price vs SMA 20/50, 2% Fibonacci proximity) to every bar
+at once. Accepts 1-D arrays or 2-D arrays with one row per symbol, like
+``indicators.compute_indicators``. Fibonacci levels at each bar only use
+the range of the last ``FIB_WINDOW`` bars up to that bar, so the series
+has no look-ahead and old extremes eventually stop counting.
+"""
+import warnings
+
+import numpy as np
+
+RSI_OVERSOLD = 30
+RSI_OVERBOUGHT = 70
+FIB_PROXIMITY = 0.02
+FIB_SUPPORT = (0.236, 0.382)
+FIB_RESISTANCE = (0.618, 0.786)
+BUY_THRESHOLD = 2
+SELL_THRESHOLD = -2
+# One year of sessions, so the default 1y analysis sees the same range as before
+FIB_WINDOW = 252
+
+
+def running_range(high, low, window=None):
+    """Highest high and lowest low up to each bar, over all history or the last ``window`` bars"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    top = np.fmax.accumulate(high, axis=-1)
+    bottom = np.fmin.accumulate(low, axis=-1)
+    if window is None or window >= high.shape[-1]:
+        return top, bottom
+
+    windows_high = np.lib.stride_tricks.sliding_window_view(high, window, axis=-1)
+    windows_low = np.lib.stride_tricks.sliding_window_view(low, window, axis=-1)
+    with warnings.catch_warnings():
+        # All-NaN windows (padding before a symbol's history starts) stay NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        top[..., window - 1:] = np.nanmax(windows_high, axis=-1)
+        bottom[..., window - 1:] = np.nanmin(windows_low, axis=-1)
+    return top, bottom
+
+
+def fibonacci_series(high, low, window=FIB_WINDOW):
+    """Fibonacci retracement levels at every bar, keyed like ``analysis.fibonacci_levels``"""
+    top, bottom = running_range(high, low, window)
+    diff = top - bottom
+    levels = {'0.0': bottom}
+    for ratio in (0.236, 0.382, 0.5, 0.618, 0.786):
+        levels[str(ratio)] = bottom + ratio * diff
+    levels['1.0'] = top
+    return levels
+
+
+def strength_series(close, high, low, indicators, fib_window=FIB_WINDOW, levels=None):
+    """Recommendation strength at every bar as an integer array
+
+    ``levels`` reuses Fibonacci levels already computed by ``fibonacci_series``.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rsi = indicators['rsi']
+        strength = 2 * (rsi < RSI_OVERSOLD).astype(np.int64) - 2 * (rsi > RSI_OVERBOUGHT)
+
+        strength += np.where(indicators['macd'] > indicators['macd_signal'], 1, -1)
+
+        sma_20, sma_50 = indicators['sma_20'], indicators['sma_50']
+        strength += (close > sma_20) & (sma_20 > sma_50)
+        strength -= (close < sma_20) & (sma_20 < sma_50)
+
+        if levels is None:
+            levels = fibonacci_series(high, low, fib_window)
+        for ratio in FIB_SUPPORT:
+            level = levels[str(ratio)]
+            strength += np.abs(close - level) / level < FIB_PROXIMITY
+        for ratio in FIB_RESISTANCE:
+            level = levels[str(ratio)]
+            strength -= np.abs(close - level) / level < FIB_PROXIMITY
+    return strength
+
+
+def recommendation_series(strength):
+    """Map strength to +1 (buy), -1 (sell) or 0 (hold)"""
+    strength = np.asarray(strength)
+    return np.where(strength >= BUY_THRESHOLD, 1, np.where(strength <= SELL_THRESHOLD, -1, 0))
@@ -0,0 +1,336 @@
+"""Upstream market data sources.
+
+Everything that talks to a data provider goes through the source returned
+by ``get_source()``: ``history`` for one symbol's bars, ``download`` for a
+multi-symbol batch and ``info`` for metadata, all shaped like yfinance's.
+``DATA_SOURCE=yahoo_chart`` reads Yahoo's chart endpoint through the
+pooled asyncio client in ``yahoo_chart`` instead of yfinance.
+``DATA_SOURCE=fake`` swaps Yahoo Finance for a deterministic synthetic
+source and ``DATA_SOURCE=recorded`` replays bars saved earlier with
+``record_history``, for development, load tests and benchmarks without
+network access.
+"""
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from yahoo_chart import DEFAULT_URL, ChartClient
+
+INTRADAY_INTERVALS = {'1m': '1min', '2m': '2min', '5m': '5min', '15m': '15min', '30m': '30min',
+                      '60m': '60min', '90m': '90min', '1h': '60min'}
+CALENDAR_INTERVALS = {'1d': 'B', '5d': '5B', '1wk': 'W-FRI', '1mo': 'MS', '3mo': 'QS'}
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+FAKE_ORIGIN = '2000-01-03'
+FAKE_INTRADAY_DAYS = 60
+FAKE_TZ = 'America/New_York'
+
+
+class YahooSource:
+    # yfinance takes longer to import than the rest of the app together; offline sources never need it
+    name = 'yahoo'
+
+    def history(self, symbol, **kwargs):
+        import yfinance as yf
+        return yf.Ticker(symbol).history(**kwargs)
+
+    def download(self, symbols, **kwargs):
+        import yfinance as yf
+        return yf.download(list(symbols), **kwargs)
+
+    def info(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+
+class YahooChartSource:
+    """Yahoo Finance's chart endpoint over a shared keep-alive connection pool, shaped like yfinance.
+
+    ``download`` fetches its symbols concurrently rather than one by one.
+    """
+    name = 'yahoo_chart'
+
+    def __init__(self, url=None, connections=8, timeout=10):
+        self.client = ChartClient(url or DEFAULT_URL, connections=connections, timeout=timeout)
+
+    def history(self, symbol, period=None, start=None, end=None, interval='1d', auto_adjust=True, **kwargs):
+        window = start is not None or end is not None
+        chart = self.client.run(self.client.chart(symbol, interval=interval, period=None if window else period,
+                                                  start=start, end=end))
+        return chart_frame(chart, interval, None if window else period, auto_adjust)
+
+    def download(self, symbols, period='5d', interval='1d', group_by='column', auto_adjust=True, **kwargs):
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        charts = self.client.run(self.client.charts(symbols, interval=interval, period=period))
+        frames, errors = {}, []
+        for symbol, chart in zip(symbols, charts):
+            if isinstance(chart, Exception):
+                print(f"Error fetching chart for {symbol}: {chart}")
+                errors.append(chart)
+                continue
+            data = chart_frame(chart, interval, period, auto_adjust)
+            if not data.empty:
+                frames[symbol] = data[PRICE_COLUMNS]
+        if not frames:
+            # Nothing but failures is an upstream failure, so the fetch scheduler's breaker counts it
+            if errors and len(errors) == len(symbols):
+                raise errors[0]
+            return pd.DataFrame()
+        data = pd.concat(frames, axis=1)
+        return data if group_by == 'ticker' else data.swaplevel(axis=1)
+
+    def info(self, symbol):
+        chart = self.client.run(self.client.chart(symbol, interval='1d', period='5d'))
+        meta = chart[0] if chart is not None else {}
+        return {
+            'symbol': meta.get('symbol', symbol.upper()),
+            'longName': meta.get('longName'),
+            'shortName': meta.get('shortName'),
+            'currency': meta.get('currency'),
+            'exchange': meta.get('fullExchangeName') or meta.get('exchangeName'),
+            'regularMarketPrice': meta.get('regularMarketPrice'),
+        }
+
+
+def chart_frame(chart, interval='1d', period=None, auto_adjust=True):
+    """yfinance-shaped bars of a chart response parsed by ``yahoo_chart.parse_chart``"""
+    intraday = interval in INTRADAY_INTERVALS
+    if chart is None:
+        return _empty_bars('UTC', 'Datetime' if intraday else 'Date')
+    meta, columns = chart
+    index = pd.to_datetime(columns['timestamp'], unit='s', utc=True).tz_convert(
+        meta.get('exchangeTimezoneName') or 'UTC')
+    if not intraday:
+        # Daily and longer bars are stamped at the session open; yfinance dates them at midnight
+        index = index.normalize()
+
+    prices = [columns[name] for name in ('open', 'high', 'low', 'close')]
+    if auto_adjust and columns['adjclose'] is not None:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = columns['adjclose'] / columns['close']
+        prices = [values * ratio for values in prices[:3]] + [columns['adjclose']]
+
+    data = pd.DataFrame(dict(zip(['Open', 'High', 'Low', 'Close'], prices),
+                             Volume=columns['volume'],
+                             Dividends=columns['dividends'],
+                             **{'Stock Splits': columns['splits']}),
+                        index=pd.DatetimeIndex(index, name='Datetime' if intraday else 'Date'))
+    # Bars without trades come back as nulls; the live bar can repeat the last session's date
+    data = data[~np.isnan(columns['close'])]
+    data = data[~data.index.duplicated(keep='last')]
+    return _tail_period(data, period) if period else data
+
+
+class FakeSource:
+    """Synthetic random-walk prices, identical for a symbol on every call.
+
+    Daily history starts in 2000 and intraday history covers the last 60
+    days of regular sessions. The latest bar drifts from minute to minute
+    so streams and top-ups see movement. ``latency`` seconds are added to
+    every call and ``failure_rate`` of calls raise ``ConnectionError``.
+    """
+    name = 'fake'
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise ConnectionError('fake source: simulated upstream failure')
+
+    def history(self, symbol, period=None, start=None, end=None, interval='1d', **kwargs):
+        self._call()
+        data = synthetic_bars(symbol.upper(), interval)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start).tz_localize(FAKE_TZ)]
+        elif period and period != 'max':
+            data = _tail_period(data, period)
+        if end is not None:
+            data = data[data.index < pd.Timestamp(end).tz_localize(FAKE_TZ)]
+        return data.copy()
+
+    def download(self, symbols, period='5d', interval='1d', **kwargs):
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self._call()
+        frames = {symbol: _tail_period(synthetic_bars(symbol.upper(), interval), period) for symbol in symbols}
+        return pd.concat(frames, axis=1)
+
+    def info(self, symbol):
+        self._call()
+        return {'symbol': symbol.upper(), 'longName': f'{symbol.upper()} (synthetic)'}
+
+
+class RecordedSource:
+    """Replays bars saved by ``record_history``: one ``<SYMBOL>_<interval>.csv`` per series"""
+    name = 'recorded'
+
+    def __init__(self, directory, tz=FAKE_TZ):
+        self.directory = directory
+        self.tz = tz
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _bars(self, symbol, interval):
+        key = (symbol.upper(), interval)
+        with self._lock:
+            if key not in self._series:
+                path = os.path.join(self.directory, f'{key[0]}_{interval}.csv')
+                if os.path.exists(path):
+                    data = pd.read_csv(path, index_col=0)
+                    data.index = pd.DatetimeIndex(pd.to_datetime(data.index, utc=True).tz_convert(self.tz),
+                                                  name=data.index.name)
+                else:
+                    # yfinance answers an unknown symbol with an empty frame too
+                    data = _empty_bars(self.tz)
+                self._series[key] = data
+            return self._series[key]
+
+    def history(self, symbol, period=None, start=None, end=None, interval='1d', **kwargs):
+        data = self._bars(symbol, interval)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start).tz_localize(self.tz)]
+        elif period and period != 'max':
+            data = _tail_period(data, period)
+        if end is not None:
+            data = data[data.index < pd.Timestamp(end).tz_localize(self.tz)]
+        return data.copy()
+
+    def download(self, symbols, period='5d', interval='1d', **kwargs):
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        frames = {symbol: _tail_period(self._bars(symbol, interval), period) for symbol in symbols}
+        return pd.concat(frames, axis=1)
+
+    def info(self, symbol):
+        return {'symbol': symbol.upper(), 'longName': symbol.upper()}
+
+
+def record_history(source, symbols, directory, period='10y', interval='1d'):
+    """Save ``source``'s bars for ``symbols`` where ``RecordedSource`` can replay them"""
+    os.makedirs(directory, exist_ok=True)
+    saved = []
+    for symbol in symbols:
+        data = source.history(symbol, period=period, interval=interval)
+        if data is None or data.empty:
+            print(f"No data to record for {symbol}")
+            continue
+        data.index = data.index.tz_convert('UTC') if data.index.tz is not None else data.index
+        data.to_csv(os.path.join(directory, f'{symbol.upper()}_{interval}.csv'))
+        saved.append(symbol.upper())
+    return saved
+
+
+def synthetic_bars(symbol, interval='1d'):
+    """The fake source's full history for one series, as of the current minute"""
+    return _synthetic_bars(symbol, interval, int(time.time() // 60))
+
+
+@lru_cache(maxsize=256)
+def _synthetic_bars(symbol, interval, minute):
+    now = pd.Timestamp(minute * 60, unit='s', tz='UTC').tz_convert(FAKE_TZ)
+    if interval in INTRADAY_INTERVALS:
+        days = pd.bdate_range(now.normalize() - pd.Timedelta(days=FAKE_INTRADAY_DAYS), now.normalize(), tz=FAKE_TZ)
+        sessions = [pd.date_range(day + pd.Timedelta(hours=9, minutes=30), day + pd.Timedelta(hours=16),
+                                  freq=INTRADAY_INTERVALS[interval], inclusive='left') for day in days]
+        index = sessions[0].append(sessions[1:])
+        index = index[index <= now]
+        scale = 0.002
+    elif interval in CALENDAR_INTERVALS:
+        index = pd.date_range(pd.Timestamp(FAKE_ORIGIN, tz=FAKE_TZ), now.normalize(),
+                              freq=CALENDAR_INTERVALS[interval])
+        scale = 0.015
+    else:
+        raise ValueError(f"Unsupported interval: {interval}")
+
+    seed = zlib.crc32(f'{symbol}:{interval}'.encode())
+    rng = np.random.default_rng(seed)
+    close = (20 + seed % 300) * np.exp(np.cumsum(rng.normal(0.0002, scale, len(index))))
+    if len(close):
+        close[-1] *= 1 + np.random.default_rng([seed, minute]).normal(0, scale / 4)
+    spread = np.abs(rng.normal(0, scale, len(index)))
+    open_ = np.concatenate([close[:1], close[:-1]])
+
+    data = pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(np.maximum(open_, close), close * (1 + spread)),
+        'Low': np.minimum(np.minimum(open_, close), close * (1 - spread)),
+        'Close': close,
+        'Volume': rng.integers(100_000, 10_000_000, len(index)).astype(float),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0,
+    }, index=index)
+    data.index.name = 'Datetime' if interval in INTRADAY_INTERVALS else 'Date'
+    return data
+
+
+def _empty_bars(tz, name='Date'):
+    return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], tz=tz, name=name), dtype=float)
+
+
+def _tail_period(data, period):
+    if period == 'max' or not len(data):
+        return data
+    if period == 'ytd':
+        return data[data.index >= data.index[-1].replace(month=1, day=1).normalize()]
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period or '')
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == 'd':
+        sessions = data.index.normalize().unique()[-count:]
+        return data[data.index.normalize().isin(sessions)]
+    offset = {'wk': pd.DateOffset(weeks=count), 'mo': pd.DateOffset(months=count),
+              'y': pd.DateOffset(years=count)}[unit]
+    return data[data.index > data.index[-1] - offset]
+
+
+SOURCES = {'yahoo': YahooSource, 'yahoo_chart': YahooChartSource, 'fake': FakeSource, 'recorded': RecordedSource}
+
+_source = None
+_source_lock = threading.Lock()
+
+
+def create_source(name):
+    if name not in SOURCES:
+        raise ValueError(f"Unknown data source: {name}")
+    if name == 'fake':
+        return FakeSource(latency=float(os.getenv('FAKE_SOURCE_LATENCY', 0)),
+                          failure_rate=float(os.getenv('FAKE_SOURCE_FAILURE_RATE', 0)))
+    if name == 'recorded':
+        return RecordedSource(os.getenv('RECORDED_SOURCE_PATH', 'recordings'))
+    if name == 'yahoo_chart':
+        return YahooChartSource(os.getenv('YAHOO_CHART_URL') or None,
+                                connections=int(os.getenv('YAHOO_CHART_CONNECTIONS', 8)),
+                                timeout=float(os.getenv('YAHOO_CHART_TIMEOUT', 10)))
+    return SOURCES[name]()
+
+
+def get_source():
+    """The process-wide source, created from ``DATA_SOURCE`` on first use"""
+    global _source
+    with _source_lock:
+        if _source is None:
+            _source = create_source(os.getenv('DATA_SOURCE', 'yahoo'))
+        return _source
+
+
+def set_source(source):
+    global _source
+    with _source_lock:
+        _source = source
@@ -181,8 +181,64 @@ const FormValidator = {
     }
 };
 
+// Packed columns (see responses.py): a JSON header followed by 8-byte aligned little-endian arrays
+const COLUMNS_MIMETYPE = 'application/vnd.stock-tracker.columns';
+
+const ColumnDecoders = {
+    // Rounded back to the 4 decimals the JSON form carries
+    f4: (buffer, offset, length) => Array.from(new Float32Array(buffer, offset, length),
+        value => Number.isNaN(value) ? null : Math.round(value * 1e4) / 1e4),
+    f8: (buffer, offset, length) => Array.from(new Float64Array(buffer, offset, length),
+        value => Number.isNaN(value) ? null : value),
+    i4: (buffer, offset, length) => Array.from(new Int32Array(buffer, offset, length)),
+    // Exchange-local milliseconds, formatted like the JSON dates
+    date: (buffer, offset, length) => Array.from(new Float64Array(buffer, offset, length),
+        ms => new Date(ms).toISOString().slice(0, 10)),
+    datetime: (buffer, offset, length) => Array.from(new Float64Array(buffer, offset, length),
+        ms => new Date(ms).toISOString().slice(0, 16).replace('T', ' '))
+};
+
+function decodeColumns(buffer) {
+    const view = new DataView(buffer);
+    const headerLength = view.getUint32(8, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headerLength)));
+    let offset = Math.ceil((12 + headerLength) / 8) * 8;
+    const columns = header.columns.map(([type, length]) => {
+        const column = ColumnDecoders[type](buffer, offset, length);
+        const size = type === 'f4' || type === 'i4' ? 4 : 8;
+        offset += Math.ceil(length * size / 8) * 8;
+        return column;
+    });
+    const resolve = value => {
+        if (Array.isArray(value)) {
+            return value.map(resolve);
+        }
+        if (value !== null && typeof value === 'object') {
+            if ('$column' in value) {
+                return columns[value.$column];
+            }
+            return Object.fromEntries(Object.entries(value).map(([key, item]) => [key, resolve(item)]));
+        }
+        return value;
+    };
+    return resolve(header.payload);
+}
+
 // API Utilities
 const API = {
+    // Fetch a data endpoint as packed columns, decoded to the same object its JSON form gives
+    fetchColumns: async function(url) {
+        const response = await fetch(url, {headers: {Accept: `${COLUMNS_MIMETYPE}, application/json;q=0.5`}});
+        if (!response.ok) {
+            throw new Error('Network response was not ok');
+        }
+        if (response.headers.get('Content-Type') === COLUMNS_MIMETYPE) {
+            return decodeColumns(await response.arrayBuffer());
+        }
+        return await response.json();
+    },
+
+
     // Fetch stock data
     fetchStockData: async function(symbol) {
         try {
@@ -238,15 +294,6 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Auto-refresh portfolio data
-    const portfolioTable = document.getElementById('portfolioTable');
-    if (portfolioTable) {
-        // Refresh every 30 seconds
-        setInterval(() => {
-            updatePortfolioData();
-        }, 30000);
-    }
-
     // Symbol input auto-uppercase
     const symbolInputs = document.querySelectorAll('input[name="symbol"]');
     symbolInputs.forEach(input => {
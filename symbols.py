@@ -0,0 +1,161 @@
+"""Local symbol/name directory with a prefix index for typeahead search.
+
+Entries come from the bundled ``data/symbols.csv``, an optional larger
+listing (any CSV, or a NASDAQ Trader pipe-delimited symbol file), and
+names learned at runtime, which are appended to a local file so they
+survive restarts. Lookups never touch the network.
+"""
+import csv
+import os
+import re
+import threading
+from bisect import insort
+
+BUNDLED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'symbols.csv')
+SYMBOL_COLUMNS = ('Symbol', 'ACT Symbol', 'NASDAQ Symbol', 'Ticker', 'symbol')
+NAME_COLUMNS = ('Name', 'Security Name', 'Security', 'Company', 'name')
+WORD = re.compile(r'[a-z0-9]+')
+
+
+def normalize_symbol(symbol):
+    """Upper-case with Yahoo's share-class separator (BRK.B -> BRK-B)"""
+    return symbol.strip().upper().replace('.', '-')
+
+
+class _Node:
+    __slots__ = ('children', 'matches')
+
+    def __init__(self):
+        self.children = {}
+        self.matches = []
+
+
+class PrefixIndex:
+    """Trie whose nodes keep their best ``limit`` matches, so a lookup costs O(len(prefix))"""
+
+    def __init__(self, limit=20):
+        self.limit = limit
+        self._root = _Node()
+
+    def add(self, key, rank, value):
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _Node())
+            self._keep(node, (rank, value))
+
+    def _keep(self, node, item):
+        matches = node.matches
+        for i, (rank, value) in enumerate(matches):
+            if value == item[1]:
+                if rank <= item[0]:
+                    return
+                del matches[i]
+                break
+        if len(matches) < self.limit or item < matches[-1]:
+            insort(matches, item)
+            del matches[self.limit:]
+
+    def search(self, prefix):
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [value for _, value in node.matches]
+
+
+class SymbolDirectory:
+    """Symbol -> company name map searchable by symbol or name-word prefix.
+
+    Symbol matches rank ahead of name matches, shorter symbols first, and
+    a name match on the first word ahead of one on a later word.
+    """
+
+    def __init__(self, limit=20):
+        self.limit = limit
+        self._names = {}
+        self._index = PrefixIndex(limit)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, symbol, name):
+        symbol = normalize_symbol(symbol)
+        if not symbol:
+            return
+        name = (name or '').strip() or symbol
+        with self._lock:
+            self._names[symbol] = name
+            self._index.add(symbol.lower(), (0, len(symbol), symbol), symbol)
+            for position, word in enumerate(WORD.findall(name.lower())):
+                self._index.add(word, (1, position, len(symbol), symbol), symbol)
+
+    def load(self, path):
+        """Add every entry of a CSV or pipe-delimited listing; returns how many were read"""
+        with open(path, newline='', encoding='utf-8') as f:
+            header = f.readline()
+            f.seek(0)
+            reader = csv.DictReader(f, delimiter='|' if header.count('|') > header.count(',') else ',')
+            symbol_column = next((c for c in SYMBOL_COLUMNS if c in reader.fieldnames), None)
+            name_column = next((c for c in NAME_COLUMNS if c in reader.fieldnames), None)
+            if symbol_column is None:
+                raise ValueError(f"{path} has no symbol column")
+
+            count = 0
+            for row in reader:
+                # NASDAQ Trader files end with a "File Creation Time" line and flag test issues
+                if row.get('Test Issue') == 'Y' or not row.get(name_column or symbol_column):
+                    continue
+                symbol = row[symbol_column]
+                if not symbol or ' ' in symbol.strip():
+                    continue
+                self.add(symbol, row.get(name_column) if name_column else None)
+                count += 1
+        return count
+
+    def remember(self, symbol, name, path):
+        """Add a name learned at runtime and append it to ``path`` for the next start"""
+        self.add(symbol, name)
+        new_file = not os.path.exists(path)
+        with self._lock, open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(['Symbol', 'Name'])
+            writer.writerow([normalize_symbol(symbol), name])
+
+    def name(self, symbol):
+        return self._names.get(normalize_symbol(symbol))
+
+    def search(self, query, limit=10):
+        """Up to ``limit`` {'symbol', 'name'} matches for a symbol or company-name prefix"""
+        words = WORD.findall(query.lower())
+        if not words:
+            return []
+        with self._lock:
+            # Symbols keep their separators ("brk-"); names are matched word by word
+            matches = [] if ' ' in query.strip() else self._index.search(normalize_symbol(query).lower())
+            named = self._index.search(words[0])
+            if len(words) > 1:
+                phrase = ' '.join(words)
+                named = [symbol for symbol in named
+                         if phrase in ' '.join(WORD.findall(self._names[symbol].lower()))]
+            results = []
+            for symbol in dict.fromkeys(matches + named):
+                results.append({'symbol': symbol, 'name': self._names[symbol]})
+                if len(results) >= limit:
+                    break
+        return results
+
+
+def load_directory(*paths, limit=20):
+    """Build a directory from the bundled listing plus any of ``paths`` that exist"""
+    directory = SymbolDirectory(limit)
+    for path in (BUNDLED_PATH,) + paths:
+        if not path or not os.path.exists(path):
+            continue
+        try:
+            directory.load(path)
+        except Exception as e:
+            print(f"Error loading symbol directory {path}: {e}")
+    return directory
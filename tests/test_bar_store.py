@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from bar_store import INTRADAY_DAYS, BarStore, period_start
+import column_store
+from column_store import ColumnStore
+from sources import FakeSource
+
+
+def test_column_reads_match_sqlite_reads(tmp_path):
+    source = FakeSource()
+    store = BarStore(str(tmp_path / 'bars.db'), source=source, columns_path=str(tmp_path / 'columns'))
+    sqlite_only = BarStore(str(tmp_path / 'bars.db'), refresh_seconds=3600, source=source)
+
+    columns = store.get_bars('AAPL', '2y')
+    rows = sqlite_only.get_bars('AAPL', '2y')
+    assert columns.dtypes.eq(np.float64).all()
+    pd.testing.assert_frame_equal(columns, rows, check_freq=False, check_exact=True)
+
+
+def test_float32_column_files_are_exported_again(tmp_path, monkeypatch):
+    store = BarStore(str(tmp_path / 'bars.db'), source=FakeSource(), columns_path=str(tmp_path / 'columns'))
+    expected = store.get_bars('MSFT', '1y')
+
+    # Rewrite the file the way it was stored before prices were kept as float64
+    current = store.columns.read('MSFT', '1d')
+    with monkeypatch.context() as patch:
+        for name in ('open', 'high', 'low', 'close'):
+            patch.setitem(column_store.DTYPES, name, '<f4')
+        ColumnStore(str(tmp_path / 'columns')).write(
+            'MSFT', '1d', current.ts, current.open, current.high, current.low, current.close, current.volume,
+            tz=current.tz, generation=current.generation)
+    assert ColumnStore(str(tmp_path / 'columns')).read('MSFT', '1d') is None
+
+    pd.testing.assert_frame_equal(store.get_bars('MSFT', '1y'), expected, check_freq=False, check_exact=True)
+    assert store.columns.read('MSFT', '1d').close.dtype == np.float64
+
+
+def test_intraday_periods_start_inside_yahoos_window():
+    now = datetime(2026, 10, 16, 20, tzinfo=timezone.utc)
+    earliest = int((now - timedelta(days=INTRADAY_DAYS)).timestamp())
+    assert period_start('60d', now, interval='5m') == earliest
+    assert period_start('5d', now, interval='5m') > earliest
+    assert period_start('60d', now) < earliest
+
+
+class EmptySource:
+    name = 'empty'
+
+    def __init__(self):
+        self.calls = 0
+
+    def history(self, symbol, **kwargs):
+        self.calls += 1
+        return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+
+
+def test_empty_download_records_no_coverage(tmp_path):
+    source = EmptySource()
+    store = BarStore(str(tmp_path / 'bars.db'), source=source)
+
+    assert store.get_bars('AAPL', '60d', '5m').empty
+    assert store.get_bars('AAPL', '60d', '5m').empty
+    assert source.calls == 2
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from fetch_scheduler import DASHBOARD, INTERACTIVE, PREWARM, CircuitOpenError, FetchScheduler, ScheduledSource
+from sources import FakeSource
+
+
+def scheduler(**kwargs):
+    return FetchScheduler(**dict({'rate': 1000, 'burst': 1000, 'workers': 1}, **kwargs))
+
+
+def test_breaker_opens_rejects_and_recovers_through_half_open():
+    source = FakeSource(failure_rate=1.0)
+    upstream = ScheduledSource(source, scheduler(failure_threshold=3, reset_timeout=0.2), timeout=5)
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            upstream.info('AAPL')
+    assert upstream.scheduler.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        upstream.info('AAPL')
+    assert source.calls == 3
+
+    # One failed trial while half open opens the circuit again straight away
+    time.sleep(0.25)
+    assert upstream.scheduler.breaker.state == 'half_open'
+    with pytest.raises(ConnectionError):
+        upstream.info('AAPL')
+    assert upstream.scheduler.breaker.state == 'open'
+
+    time.sleep(0.25)
+    source.failure_rate = 0.0
+    assert upstream.info('AAPL')['symbol'] == 'AAPL'
+    assert upstream.scheduler.breaker.state == 'closed'
+    assert upstream.scheduler.stats()['rejected'] == 1
+
+
+def test_queued_calls_run_by_priority():
+    fetches = scheduler()
+    started, release, order = threading.Event(), threading.Event(), []
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    fetches.submit(block)
+    started.wait(5)
+    futures = [fetches.submit(order.append, name, priority=priority)
+               for name, priority in (('prewarm', PREWARM), ('dashboard', DASHBOARD),
+                                      ('interactive', INTERACTIVE), ('dashboard 2', DASHBOARD))]
+    release.set()
+    for future in futures:
+        future.result(5)
+    assert order == ['interactive', 'dashboard', 'dashboard 2', 'prewarm']
+
+
+def test_token_bucket_limits_the_call_rate():
+    source = FakeSource()
+    upstream = ScheduledSource(source, scheduler(rate=20, burst=2, workers=4), timeout=5)
+
+    started = time.monotonic()
+    for _ in range(12):
+        upstream.info('AAPL')
+    elapsed = time.monotonic() - started
+
+    # Two calls come from the burst, the other ten wait for tokens at 20 per second
+    assert elapsed >= 0.45
+    assert source.calls == 12
+    assert upstream.scheduler.stats()['throttled_seconds'] > 0
+
+
+def test_scheduled_fake_source_serves_history():
+    upstream = ScheduledSource(FakeSource(), scheduler(), timeout=5)
+    data = upstream.history('MSFT', period='1mo')
+    assert not data.empty
+    assert {'Open', 'High', 'Low', 'Close', 'Volume'} <= set(data.columns)
+    assert upstream.scheduler.stats()['executed'] == 1
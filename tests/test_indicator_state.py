@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import calculate_signal_history, calculate_technical_indicators, generate_trading_recommendation
+from indicator_state import IndicatorState
+from indicators import compute_indicators
+from signals import FIB_WINDOW, running_range
+
+
+def random_bars(seed, count=FIB_WINDOW + 150):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, count)))
+    spread = close * rng.uniform(0.001, 0.03, count)
+    return pd.DataFrame({'Open': close, 'High': close + spread, 'Low': close - spread, 'Close': close,
+                         'Volume': rng.integers(1_000, 100_000, count)},
+                        index=pd.date_range('2020-01-01', periods=count, freq='B'))
+
+
+def assert_matches(snapshot, expected, position):
+    for name, values in expected.items():
+        assert snapshot[name] == pytest.approx(values[position], rel=1e-9, abs=1e-9, nan_ok=True), name
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_updates_match_compute_indicators(seed):
+    data = random_bars(seed)
+    expected = compute_indicators(data['Close'].to_numpy(dtype=float))
+
+    state = IndicatorState()
+    for i, (close, high, low) in enumerate(zip(data['Close'], data['High'], data['Low'])):
+        assert_matches(state.update(close, high, low), expected, i)
+
+
+def test_revised_last_bar_matches_a_fresh_computation():
+    data = random_bars(0)
+    closes = data['Close'].to_numpy(dtype=float)
+    state = IndicatorState.from_history(data.iloc[:-1])
+    state.update(closes[-2] * 1.01)
+    snapshot = state.revise(closes[-1])
+
+    assert_matches(snapshot, compute_indicators(closes), -1)
+    assert state.close == closes[-1]
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_streaming_matches_signal_history(seed):
+    data = random_bars(seed)
+    history = calculate_signal_history(data, calculate_technical_indicators(data))
+    top, bottom = running_range(data['High'], data['Low'], FIB_WINDOW)
+
+    state = IndicatorState()
+    for i, (close, high, low) in enumerate(zip(data['Close'], data['High'], data['Low'])):
+        state.update(close, high, low)
+        assert (state.high, state.low) == (top[i], bottom[i])
+        assert generate_trading_recommendation(None, state)['strength'] == history['strength'].iloc[i]
+
+
+def test_revised_bar_widens_the_window_range():
+    data = random_bars(0)
+    state = IndicatorState.from_history(data.iloc[:-1])
+    last = data.iloc[-1]
+    state.update(last['Close'], last['Close'], last['Close'])
+    state.revise(last['Close'], last['High'], last['Low'])
+
+    top, bottom = running_range(data['High'], data['Low'], FIB_WINDOW)
+    assert (state.high, state.low) == (top[-1], bottom[-1])
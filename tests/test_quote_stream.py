@@ -0,0 +1,33 @@
+from quote_stream import QuoteHub
+
+
+def quote_all_but(missing):
+    def fetch(symbols):
+        return {symbol: {'price': 100.0} for symbol in symbols if symbol not in missing}
+    return fetch
+
+
+def test_unquoted_symbol_is_delivered_once_as_none():
+    hub = QuoteHub(quote_all_but({'GONE'}), interval=0.05)
+    subscription = hub.subscribe(['aapl', 'gone'])
+
+    assert subscription.get(timeout=2) == {'AAPL': {'price': 100.0}, 'GONE': None}
+    # Later refreshes change nothing, so nothing more is pushed
+    assert subscription.get(timeout=0.3) == {}
+
+
+def test_late_subscriber_gets_the_snapshot_then_the_failure():
+    hub = QuoteHub(quote_all_but({'GONE'}), interval=0.05)
+    hub.subscribe(['AAPL', 'GONE']).get(timeout=2)
+
+    subscription = hub.subscribe(['AAPL', 'GONE'])
+    assert subscription.get(timeout=0) == {'AAPL': {'price': 100.0}}
+    assert subscription.get(timeout=2) == {'GONE': None}
+
+
+def test_failed_refresh_reports_every_pending_symbol():
+    def fetch(symbols):
+        raise RuntimeError('upstream down')
+
+    subscription = QuoteHub(fetch, interval=60).subscribe(['AAPL', 'MSFT'])
+    assert subscription.get(timeout=2) == {'AAPL': None, 'MSFT': None}
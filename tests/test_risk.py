@@ -0,0 +1,20 @@
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+from risk import portfolio_risk
+
+
+def test_parametric_var_scales_mean_linearly_and_volatility_by_root_time():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.001, 0.02, (500, 3))
+    weights = np.array([0.6, 0.4])
+
+    portfolio = returns[:, :2] @ weights
+    sigma = np.std(portfolio, ddof=1)
+    z = NormalDist().inv_cdf(0.99)
+    report = portfolio_risk(returns, weights, confidence=0.99, horizon=10)
+
+    assert report['var_parametric'] == pytest.approx(z * sigma * np.sqrt(10) - portfolio.mean() * 10)
+    assert report['var_historical'] == pytest.approx(-np.quantile(portfolio, 0.01) * np.sqrt(10))
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import numpy as np
+import orjson
+import pandas as pd
+import pytest
+
+from sources import YahooChartSource
+from yahoo_chart import ConnectionPool, ReplayServer
+
+DAY = 86400
+
+
+def chart_body(symbol, days=10):
+    # Sessions open at 13:30 UTC (9:30 in New York), ending yesterday
+    today = int(time.time()) // DAY * DAY
+    timestamps = [today - (days - i) * DAY + 13 * 3600 + 1800 for i in range(days)]
+    close = [100.0 + i for i in range(days)]
+    close[3] = None  # a bar without trades
+    return orjson.dumps({'chart': {'result': [{
+        'meta': {'symbol': symbol, 'currency': 'USD', 'exchangeName': 'NMS',
+                 'exchangeTimezoneName': 'America/New_York', 'regularMarketPrice': 109.0},
+        'timestamp': timestamps,
+        'events': {
+            'dividends': {str(timestamps[5]): {'amount': 0.5, 'date': timestamps[5]}},
+            'splits': {str(timestamps[7]): {'numerator': 2, 'denominator': 1, 'date': timestamps[7]}},
+        },
+        'indicators': {
+            'quote': [{'open': [c and c - 1 for c in close], 'high': [c and c + 1 for c in close],
+                       'low': [c and c - 2 for c in close], 'close': close,
+                       'volume': [1000 * (i + 1) for i in range(days)]}],
+            'adjclose': [{'adjclose': [c and c * 0.9 for c in close]}],
+        },
+    }], 'error': None}})
+
+
+@pytest.fixture
+def server(tmp_path):
+    for symbol in ('AAA', 'BBB', 'CCC', 'DDD'):
+        (tmp_path / f'{symbol}_1d.json').write_bytes(chart_body(symbol))
+    server = ReplayServer(str(tmp_path)).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def source(server):
+    source = YahooChartSource(server.url, connections=2, timeout=5)
+    yield source
+    source.client.close()
+
+
+def test_chart_response_decodes_to_yfinance_shaped_bars(source):
+    data = source.history('AAA', period='max')
+    raw = source.history('AAA', period='max', auto_adjust=False)
+
+    assert len(data) == 9
+    assert data.index.name == 'Date'
+    assert str(data.index.tz) == 'America/New_York'
+    assert (data.index == data.index.normalize()).all()
+    assert list(data.columns) == ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+    # Adjusted prices scale every price by adjclose / close
+    np.testing.assert_allclose(data['Close'], raw['Close'] * 0.9)
+    np.testing.assert_allclose(data['High'], raw['High'] * 0.9)
+    assert raw['Close'].iloc[0] == 100.0
+    assert data['Dividends'].iloc[4] == 0.5 and data['Dividends'].sum() == 0.5
+    assert data['Stock Splits'].iloc[6] == 2.0 and data['Stock Splits'].sum() == 2.0
+
+
+def test_unknown_symbol_is_an_empty_frame(source):
+    assert source.history('NOPE', period='1mo').empty
+    assert source.download(['NOPE'], period='1mo').empty
+
+
+def test_concurrent_downloads_reuse_pooled_connections(server, source):
+    symbols = ['AAA', 'BBB', 'CCC', 'DDD']
+    for _ in range(3):
+        data = source.download(symbols, period='1mo', group_by='ticker')
+        assert sorted(data.columns.get_level_values(0).unique()) == symbols
+
+    assert server.requests == 12
+    assert server.connections <= 2
+    assert source.client.pool.opened == server.connections
+
+
+def test_windowed_history_only_returns_bars_in_the_window(source):
+    everything = source.history('BBB', period='max')
+    start = everything.index[2].strftime('%Y-%m-%d')
+    end = everything.index[-2].strftime('%Y-%m-%d')
+    window = source.history('BBB', start=start, end=end)
+    pd.testing.assert_index_equal(window.index, everything.index[2:-2])
+
+
+def test_info_comes_from_chart_meta(source):
+    info = source.info('CCC')
+    assert info['symbol'] == 'CCC'
+    assert info['currency'] == 'USD'
+    assert info['exchange'] == 'NMS'
+    assert info['regularMarketPrice'] == 109.0
+
+
+def test_malformed_response_closes_the_connection():
+    async def scenario():
+        closed = asyncio.Event()
+
+        async def handle(reader, writer):
+            await reader.readuntil(b'\r\n\r\n')
+            writer.write(b'HTTP/1.1 garbage\r\n\r\n')
+            await writer.drain()
+            await reader.read()  # returns once the client closes its end
+            closed.set()
+            writer.close()
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        pool = ConnectionPool(f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}', timeout=2)
+        with pytest.raises(ValueError):
+            await pool.get('/v8/finance/chart/AAA')
+        await asyncio.wait_for(closed.wait(), 2)
+        assert not pool._idle
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(scenario())
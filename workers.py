@@ -0,0 +1,88 @@
+"""Process pool shared by the screener and the backtester.
+
+Each worker opens its own handle on the bar store, so symbols already on
+disk are read locally and only missing bars go to Yahoo. With a column
+store the workers map the same price files and share their pages.
+Upstream calls from a worker go through its own ``FetchScheduler``, and
+the workers split ``FETCH_RATE`` and ``FETCH_BURST`` between them.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from bar_store import BarStore
+from fetch_scheduler import FetchScheduler, ScheduledSource
+
+_store = None
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def init_worker(store_path, refresh_seconds, columns_path=None, data_source=None, fetch=None):
+    global _store
+    if fetch is not None:
+        from sources import create_source, set_source
+        # A worker loads one symbol at a time, so one scheduler thread is enough
+        scheduler = FetchScheduler(rate=fetch['rate'], burst=fetch['burst'], workers=1,
+                                   failure_threshold=fetch['failure_threshold'],
+                                   reset_timeout=fetch['reset_timeout'])
+        set_source(ScheduledSource(create_source(data_source), scheduler, timeout=fetch['timeout']))
+    _store = BarStore(store_path, refresh_seconds=refresh_seconds, columns_path=columns_path)
+
+
+def get_store():
+    """The bar store of the current worker process"""
+    return _store
+
+
+def pool_settings(instance_path, config=os.environ):
+    """``create_executor`` arguments from the app config, or the environment variables behind it"""
+    columns_path = config.get('COLUMN_STORE_PATH', os.path.join(instance_path, 'columns'))
+    return {
+        'store_path': config.get('BAR_STORE_PATH', os.path.join(instance_path, 'bars.db')),
+        'refresh_seconds': int(config.get('BAR_STORE_REFRESH_SECONDS', 60)),
+        'columns_path': columns_path or None,
+        'data_source': config.get('DATA_SOURCE', 'yahoo'),
+        'fetch': {
+            'rate': float(config.get('FETCH_RATE', 2)),
+            'burst': int(config.get('FETCH_BURST', 5)),
+            'failure_threshold': int(config.get('FETCH_BREAKER_FAILURES', 5)),
+            'reset_timeout': int(config.get('FETCH_BREAKER_RESET_SECONDS', 30)),
+            'timeout': int(config.get('FETCH_TIMEOUT', 30)),
+        },
+    }
+
+
+def open_pool(instance_path, workers=None):
+    """A pool for the command line tools, configured like the app's"""
+    return create_executor(workers=workers, **pool_settings(instance_path))
+
+
+def create_executor(store_path, refresh_seconds=60, workers=None, mp_context=None, columns_path=None,
+                    data_source=None, fetch=None):
+    """Process pool whose workers share the ``fetch`` limits (``pool_settings``); unthrottled without them"""
+    workers = workers or os.cpu_count()
+    if fetch is not None:
+        fetch = dict(fetch, rate=fetch['rate'] / workers, burst=max(1, fetch['burst'] // workers))
+    return ProcessPoolExecutor(max_workers=workers,
+                               mp_context=mp_context,
+                               initializer=init_worker,
+                               initargs=(store_path, refresh_seconds, columns_path, data_source, fetch))
+
+
+def get_executor(store_path, refresh_seconds=60, workers=None, columns_path=None, data_source=None, fetch=None):
+    """Pool shared by every request in this process, started on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, not fork: the web process runs background threads
+            _executor = create_executor(store_path, refresh_seconds, workers,
+                                        mp_context=multiprocessing.get_context('spawn'),
+                                        columns_path=columns_path, data_source=data_source, fetch=fetch)
+        return _executor
+
+
+def chunksize(count):
+    """Hand each worker a few batches rather than one symbol at a time"""
+    return max(1, count // (4 * (os.cpu_count() or 1)))
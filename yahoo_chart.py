@@ -0,0 +1,402 @@
+"""Asynchronous client for Yahoo Finance's chart endpoint.
+
+yfinance makes one blocking request per symbol from whichever thread asks.
+This client keeps HTTP/1.1 keep-alive connections to the chart endpoint
+in a pool owned by one event loop thread per process, so every request
+thread shares a handful of connections and many symbols are fetched
+concurrently over them. Responses are parsed straight into NumPy arrays.
+
+``sources.YahooChartSource`` (``DATA_SOURCE=yahoo_chart``) puts it behind
+``get_stock_data``. ``YAHOO_CHART_URL`` points it at another server, such
+as the stub here that replays responses recorded from Yahoo:
+
+    python yahoo_chart.py record --symbols AAPL,MSFT,^GSPC --range 10y --out recordings/chart
+    python yahoo_chart.py serve --dir recordings/chart --port 8765
+    DATA_SOURCE=yahoo_chart YAHOO_CHART_URL=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import asyncio
+import bisect
+import gzip
+import os
+import re
+import ssl
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlsplit
+
+import numpy as np
+import orjson
+import pandas as pd
+
+DEFAULT_URL = 'https://query2.finance.yahoo.com'
+CHART_PATH = '/v8/finance/chart/'
+# Ranges the endpoint accepts, with the days each covers; other periods ask for the next one up
+RANGES = [('1d', 1), ('5d', 5), ('1mo', 31), ('3mo', 92), ('6mo', 183), ('1y', 366),
+          ('2y', 731), ('5y', 1827), ('10y', 3653)]
+PERIOD_UNITS = {'d': 1, 'wk': 7, 'mo': 31, 'y': 366}
+INTRADAY_INTERVALS = {'1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h'}
+# Without a browser user agent Yahoo answers with 429
+USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/124.0 Safari/537.36')
+QUOTE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+NOT_FOUND = orjson.dumps({'chart': {'result': None, 'error': {
+    'code': 'Not Found', 'description': 'No data found, symbol may be delisted'}}})
+
+
+def chart_range(period):
+    """The smallest ``range`` value covering a yfinance period string"""
+    if period is None:
+        return '1mo'
+    if period in ('ytd', 'max') or period in dict(RANGES):
+        return period
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    days = count * PERIOD_UNITS[unit]
+    if unit == 'd':
+        # Day periods count trading sessions
+        days = days * 7 // 5 + 5
+    return next((name for name, covered in RANGES if covered >= days), 'max')
+
+
+def parse_chart(body):
+    """Meta data and int64/float64 column arrays of one chart response, or None for an unknown symbol.
+
+    Missing values (Yahoo sends null for bars without trades) become NaN;
+    dividends and split ratios are placed on the bar of their date.
+    """
+    chart = orjson.loads(body).get('chart') or {}
+    result = (chart.get('result') or [None])[0]
+    if not result:
+        return None
+
+    timestamps = np.array(result.get('timestamp') or [], dtype=np.int64)
+    indicators = result.get('indicators') or {}
+    quote = (indicators.get('quote') or [{}])[0]
+    columns = {'timestamp': timestamps}
+    for field in QUOTE_FIELDS:
+        values = quote.get(field)
+        columns[field] = (np.array(values, dtype=np.float64) if values is not None
+                          else np.full(len(timestamps), np.nan))
+    adjclose = (indicators.get('adjclose') or [{}])[0].get('adjclose')
+    columns['adjclose'] = np.array(adjclose, dtype=np.float64) if adjclose is not None else None
+
+    events = result.get('events') or {}
+    columns['dividends'] = _events(timestamps, events.get('dividends'), lambda event: event['amount'])
+    columns['splits'] = _events(timestamps, events.get('splits'),
+                                lambda event: event['numerator'] / event['denominator'])
+    return result.get('meta') or {}, columns
+
+
+def _events(timestamps, events, value):
+    placed = np.zeros(len(timestamps))
+    for event in (events or {}).values():
+        position = int(np.searchsorted(timestamps, event['date'], side='right')) - 1
+        if position >= 0:
+            placed[position] = value(event)
+    return placed
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one origin, used from a single event loop"""
+
+    def __init__(self, url, size=8, timeout=10):
+        parts = urlsplit(url)
+        self.host = parts.netloc
+        self.hostname = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.size = size
+        self.timeout = timeout
+        self.opened = 0
+        self.requests = 0
+        self._idle = []
+        self._slots = None
+
+    async def get(self, target):
+        """(status, headers, body) of a GET for ``target``, on an idle connection when there is one"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            while True:
+                reused = bool(self._idle)
+                connection = self._idle.pop() if reused else await self._open()
+                try:
+                    status, headers, body, keep_alive = await asyncio.wait_for(
+                        self._exchange(connection, target), self.timeout)
+                except asyncio.TimeoutError:
+                    connection[1].close()
+                    raise
+                except (OSError, asyncio.IncompleteReadError):
+                    connection[1].close()
+                    # The server may have dropped a connection while it sat idle; retry on the next one
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    # A malformed response or a cancelled task leaves the connection mid-exchange
+                    connection[1].close()
+                    raise
+                self.requests += 1
+                if keep_alive:
+                    self._idle.append(connection)
+                else:
+                    connection[1].close()
+                return status, headers, body
+
+    async def _open(self):
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(self.hostname, self.port, ssl=self.ssl), self.timeout)
+        self.opened += 1
+        return connection
+
+    async def _exchange(self, connection, target):
+        reader, writer = connection
+        writer.write((f'GET {target} HTTP/1.1\r\n'
+                      f'Host: {self.host}\r\n'
+                      f'User-Agent: {USER_AGENT}\r\n'
+                      'Accept: application/json\r\n'
+                      'Accept-Encoding: gzip\r\n'
+                      'Connection: keep-alive\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the server')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        if headers.get('content-encoding', '').lower() == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        return status, headers, body, keep_alive
+
+    def close(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+
+
+class ChartClient:
+    """Chart requests over one ``ConnectionPool`` on a background event loop shared by all threads"""
+
+    def __init__(self, url=DEFAULT_URL, connections=8, timeout=10):
+        self.pool = ConnectionPool(url, size=connections, timeout=timeout)
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def run(self, coroutine):
+        """Run ``coroutine`` on the client's loop from any thread and wait for its result"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='yahoo-chart', daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def fetch(self, symbol, interval='1d', period=None, start=None, end=None):
+        """Raw response body for one symbol, or None if Yahoo does not know it"""
+        params = {'interval': interval, 'includePrePost': 'false', 'events': 'div,splits'}
+        if start is not None or end is not None:
+            params['period1'] = _epoch(start) if start is not None else 0
+            params['period2'] = _epoch(end) if end is not None else int(time.time())
+        else:
+            params['range'] = chart_range(period)
+        status, _, body = await self.pool.get(f'{CHART_PATH}{quote(symbol.upper(), safe="")}?{urlencode(params)}')
+        if status == 404:
+            return None
+        if status != 200:
+            raise ConnectionError(f"Yahoo chart request for {symbol} failed with HTTP {status}")
+        return body
+
+    async def chart(self, symbol, **kwargs):
+        """(meta, columns) as ``parse_chart`` returns them, or None for an unknown symbol"""
+        body = await self.fetch(symbol, **kwargs)
+        return parse_chart(body) if body is not None else None
+
+    async def charts(self, symbols, **kwargs):
+        """``chart`` for every symbol concurrently; failures are returned in place of their result"""
+        return await asyncio.gather(*(self.chart(symbol, **kwargs) for symbol in symbols),
+                                    return_exceptions=True)
+
+    async def fetch_all(self, symbols, **kwargs):
+        """``fetch`` for every symbol concurrently; failures are returned in place of their body"""
+        return await asyncio.gather(*(self.fetch(symbol, **kwargs) for symbol in symbols),
+                                    return_exceptions=True)
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.pool.close)
+
+
+def _epoch(value):
+    if isinstance(value, (int, float)):
+        return int(value)
+    stamp = pd.Timestamp(value)
+    return int((stamp if stamp.tzinfo is not None else stamp.tz_localize('UTC')).timestamp())
+
+
+def record(symbols, directory, period='10y', interval='1d', url=DEFAULT_URL):
+    """Save raw chart responses where ``ReplayServer`` can serve them"""
+    os.makedirs(directory, exist_ok=True)
+    client = ChartClient(url)
+    bodies = client.run(client.fetch_all(symbols, interval=interval, period=period))
+    saved = []
+    for symbol, body in zip(symbols, bodies):
+        if isinstance(body, Exception) or body is None:
+            print(f"No chart data to record for {symbol}: {body}")
+            continue
+        with open(os.path.join(directory, f'{symbol.upper()}_{interval}.json'), 'wb') as f:
+            f.write(body)
+        saved.append(symbol.upper())
+    client.close()
+    return saved
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, the body waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        body = None
+        if parts.path.startswith(CHART_PATH):
+            symbol = unquote(parts.path[len(CHART_PATH):]).upper()
+            body = self.server.response(symbol, query.get('interval', ['1d'])[0], query.get('range', [None])[0],
+                                        query.get('period1', [None])[0], query.get('period2', [None])[0])
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        status = 200 if body is not None else 404
+        body = body if body is not None else NOT_FOUND
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Serves recorded chart responses (``<SYMBOL>_<interval>.json``) the way Yahoo does.
+
+    Requests get the recorded bars inside their ``range`` (counted back
+    from now) or ``period1``/``period2`` window, after ``latency`` seconds
+    standing in for the round trip to Yahoo. ``connections`` and
+    ``requests`` count what clients opened and asked for.
+    """
+    daemon_threads = True
+
+    def __init__(self, directory, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), ReplayHandler)
+        self.directory = directory
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def get_request(self):
+        with self.lock:
+            self.connections += 1
+        return super().get_request()
+
+    def response(self, symbol, interval, range=None, period1=None, period2=None):
+        path = os.path.join(self.directory, f'{symbol}_{interval}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            body = f.read()
+        if period1 is None and period2 is None:
+            if range in dict(RANGES):
+                period1 = time.time() - dict(RANGES)[range] * 86400
+            elif range == 'ytd':
+                period1 = time.mktime(time.localtime()[:1] + (1, 1, 0, 0, 0, 0, 0, -1))
+            else:
+                return body
+        return _window(body, int(period1 or 0), int(period2 or time.time()))
+
+    def start(self):
+        """Serve from a background thread; returns the server"""
+        threading.Thread(target=self.serve_forever, name='chart-replay', daemon=True).start()
+        return self
+
+
+def _window(body, period1, period2):
+    document = orjson.loads(body)
+    result = document['chart']['result'][0]
+    timestamps = result.get('timestamp') or []
+    first, last = bisect.bisect_left(timestamps, period1), bisect.bisect_left(timestamps, period2)
+    result['timestamp'] = timestamps[first:last]
+    for series in (result.get('indicators') or {}).values():
+        for values in series:
+            for name in values:
+                values[name] = values[name][first:last]
+    for kind, events in (result.get('events') or {}).items():
+        result['events'][kind] = {key: event for key, event in events.items() if period1 <= event['date'] < period2}
+    return orjson.dumps(document)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record Yahoo chart responses or replay them locally')
+    commands = parser.add_subparsers(dest='command', required=True)
+    recorder = commands.add_parser('record', help='save chart responses from Yahoo')
+    recorder.add_argument('--symbols', required=True, help='comma separated symbols')
+    recorder.add_argument('--range', default='10y')
+    recorder.add_argument('--interval', default='1d')
+    recorder.add_argument('--out', default=os.path.join('recordings', 'chart'))
+    server = commands.add_parser('serve', help='serve recorded responses as a stand-in for Yahoo')
+    server.add_argument('--dir', default=os.path.join('recordings', 'chart'))
+    server.add_argument('--host', default='127.0.0.1')
+    server.add_argument('--port', type=int, default=8765)
+    server.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+        saved = record(symbols, args.out, period=args.range, interval=args.interval)
+        print(f"Recorded {len(saved)} of {len(symbols)} symbols in {args.out}")
+    else:
+        replay = ReplayServer(args.dir, host=args.host, port=args.port, latency=args.latency)
+        print(f"Replaying {args.dir} at {replay.url}")
+        replay.serve_forever()
+
+
+if __name__ == '__main__':
+    main()